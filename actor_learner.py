@@ -0,0 +1,157 @@
+import queue
+
+import numpy as np
+import torch
+import torch.multiprocessing as mp
+
+from agent import Agent
+from metrics import MetricsLog, RollingMetrics
+from model import Linear_QNet
+from snake_game_ai import SnakeGameAI
+from state_encoder import STATE_SIZE
+
+# Transitions sent by an actor in one message
+CHUNK_SIZE = 256
+# Learner updates between two weight broadcasts to the actors
+SYNC_EVERY = 20
+
+
+def _actor(actor_id, shared_model, version, lock, transitions, stop, seed, config):
+    """
+        Play games with a local copy of the network and stream the transitions to the learner.
+        The local copy is refreshed whenever the learner publishes new weights.
+    """
+    # one thread per actor, otherwise the actors fight for the same cores
+    torch.set_num_threads(1)
+    torch.manual_seed(seed)
+
+    agent = Agent(config=config, seed=seed)
+    with lock:
+        agent.model.load_state_dict(shared_model.state_dict())
+        seen_version = version.value
+    game = SnakeGameAI(seed=seed)
+
+    states = np.zeros((CHUNK_SIZE, STATE_SIZE), dtype=np.uint8)
+    actions = np.zeros(CHUNK_SIZE, dtype=np.int8)
+    rewards = np.zeros(CHUNK_SIZE, dtype=np.float32)
+    next_states = np.zeros((CHUNK_SIZE, STATE_SIZE), dtype=np.uint8)
+    game_overs = np.zeros(CHUNK_SIZE, dtype=bool)
+    n = 0
+
+    while not stop.is_set():
+        state_old = agent.get_state(game)
+        final_move = agent.get_action(state_old)
+        reward, game_over, score = game.play_step(final_move)
+        state_new = agent.get_state(game)
+
+        states[n] = state_old
+        actions[n] = final_move
+        rewards[n] = reward
+        next_states[n] = state_new
+        game_overs[n] = game_over
+        n += 1
+
+        if game_over:
+            game.reset()
+            agent.n_games += 1
+            transitions.put(("score", actor_id, score))
+
+        if n == CHUNK_SIZE:
+            transitions.put(("transitions", actor_id, (states.copy(), actions.copy(), rewards.copy(),
+                                                       next_states.copy(), game_overs.copy())))
+            n = 0
+
+            # pick up the latest weights published by the learner
+            if version.value != seen_version:
+                with lock:
+                    agent.model.load_state_dict(shared_model.state_dict())
+                    seen_version = version.value
+
+
+def train_distributed(n_actors=4, prioritized=False, max_games=None, metrics_path=None, seed=0, config=None,
+                      target_sync=None, tau=None):
+    """
+        Actor/learner training: 'n_actors' processes play their own games and send the transitions
+        to this process, which trains the network on replay batches and periodically broadcasts
+        the updated weights back through a model kept in shared memory.
+        The scores are appended to the JSONL log 'metrics_path' (if any), as in main.train.
+        'config' holds the hyperparameters (see config.TrainConfig), 'target_sync'/'tau' give the learner
+        a target network (see QTrainer). The learner is seeded with 'seed', actor i with 'seed + i'.
+    """
+    ctx = mp.get_context("spawn")
+
+    torch.manual_seed(seed)
+    agent = Agent(prioritized=prioritized, target_sync=target_sync, tau=tau, config=config, seed=seed)
+    shared_model = Linear_QNet(STATE_SIZE, agent.config.hidden_size, agent.config.hidden_size2, 3)
+    shared_model.load_state_dict(agent.model.state_dict())
+    shared_model.share_memory()
+    version = ctx.Value("i", 0)
+    lock = ctx.Lock()
+    transitions = ctx.Queue(maxsize=64 * n_actors)
+    stop = ctx.Event()
+
+    actors = [ctx.Process(target=_actor, args=(i, shared_model, version, lock, transitions, stop, seed + i,
+                                                       agent.config),
+                          daemon=True)
+              for i in range(n_actors)]
+    for p in actors:
+        p.start()
+
+    metrics = RollingMetrics()
+    log = MetricsLog(metrics_path) if metrics_path else None
+    record = 0
+    updates = 0
+    try:
+        while max_games is None or agent.n_games < max_games:
+            # 1. collect everything the actors sent so far (wait for at least one message)
+            messages = []
+            try:
+                messages.append(transitions.get(timeout=1.0))
+                while True:
+                    messages.append(transitions.get_nowait())
+            except queue.Empty:
+                pass
+
+            for kind, actor_id, payload in messages:
+                if kind == "transitions":
+                    agent.memory.push_batch(*payload)
+                    continue
+
+                score = payload
+                agent.n_games += 1
+                metrics.add(score)
+                if score > record:
+                    record = score
+                    agent.model.save()
+                print(f"--- Game: {agent.n_games} (actor {actor_id}) - Score: {score} - Record: {record} "
+                      f"- Mean: {metrics.mean:.2f} ---")
+                if log is not None:
+                    log.write({"score": score, "actor": actor_id, **metrics.summary()})
+
+            # 2. learn from the replay memory
+            if len(agent.memory) < agent.config.batch_size:
+                continue
+            agent.train_long_memory()
+            updates += 1
+
+            # 3. broadcast the new weights
+            if updates % SYNC_EVERY == 0:
+                with lock:
+                    shared_model.load_state_dict(agent.model.state_dict())
+                    version.value += 1
+    finally:
+        stop.set()
+        # drain the queue so that the actors blocked on a full queue can exit
+        try:
+            while True:
+                transitions.get_nowait()
+        except queue.Empty:
+            pass
+        for p in actors:
+            p.join(timeout=5)
+            if p.is_alive():
+                p.terminate()
+        if log is not None:
+            log.close()
+
+    return agent
@@ -1,151 +1,188 @@
+import copy
 import os
-import random
-from collections import deque
 
 import numpy as np
-import torch
 
-from model import Linear_QNet, QTrainer
-from snake_game_ai import Direction, Point
+from config import TrainConfig
+from replay_buffer import NStepAccumulator, PrioritizedReplayBuffer, ReplayBuffer
+from state_encoder import GRID_CHANNELS, STATE_SIZE, GridEncoder, encode_state
 
-# Constants
-MAX_MEMORY = 100_000
-BATCH_SIZE = 1000
-LR = 0.001
+# Constants: the default hyperparameters (see config.TrainConfig)
+DEFAULT_CONFIG = TrainConfig()
+MAX_MEMORY = DEFAULT_CONFIG.max_memory
+BATCH_SIZE = DEFAULT_CONFIG.batch_size
+LR = DEFAULT_CONFIG.lr
+UPDATE_BATCH_SIZE = DEFAULT_CONFIG.update_batch_size
 
 
 class Agent:
-    def __init__(self) -> None:
+    """
+        Deep Q-learning agent. 'obs' selects the observation of the game:
+        - "features": the 11 state features, with Linear_QNet
+        - "grid": the full board (see state_encoder.GridEncoder) of a 'board_size' (cols, rows) game,
+          with Conv_QNet and bit-packed observations in the replay memory
+        'n_step' > 1 stores n-step transitions in the memory, 'target_sync'/'tau' bootstrap from a target
+        network (see QTrainer) and 'update_every' replaces the per-step train_short_memory with a batched
+        replay update every 'update_every' steps (see train_step).
+        The hyperparameters come from 'config' (a config.TrainConfig, the defaults if None).
+        The exploration moves are drawn from the agent's own random generator, seeded with 'seed',
+        and the replay memory samples with a generator seeded from it.
+    """
+    def __init__(self, prioritized=False, obs="features", board_size=(32, 24),
+                 n_step=1, target_sync=None, tau=None, update_every=None, config=None, seed=None) -> None:
+        self.config = config or DEFAULT_CONFIG
         self.n_games = 0
         # Parameter to control the randomness
         self.eps = 0
+        self.rng = np.random.default_rng(seed)
+        # the memory gets its own stream, independent of the exploration one
+        memory_seed = None if seed is None else np.random.SeedSequence(seed).spawn(1)[0]
         # Discount rate
-        self.gamma = 0.9
-        # If we exceed the memory deque pop from the left, very handy
-        self.memory = deque(maxlen=MAX_MEMORY)
+        self.gamma = self.config.gamma
+        self.obs = obs
+        if self.obs == "grid":
+            cols, rows = board_size
+            state_shape = (GRID_CHANNELS, rows, cols)
+            self._grid_encoder = None
+        else:
+            state_shape = STATE_SIZE
+
+        # Circular buffer: if we exceed the memory the oldest transitions are overwritten
+        self.prioritized = prioritized
+        packed = self.obs == "grid"
+        if self.prioritized:
+            self.memory = PrioritizedReplayBuffer(self.config.max_memory, state_shape, alpha=self.config.per_alpha,
+                                                  packed=packed, seed=memory_seed)
+        else:
+            self.memory = ReplayBuffer(self.config.max_memory, state_shape, packed=packed, seed=memory_seed)
         
-        # Set model and trainer
-        self.model = Linear_QNet(11, 256, 128, 3)
-        self.trainer = QTrainer(self.model, lr=LR, gamma=self.gamma)
+        # Set model and trainer: torch is imported here, not with the module,
+        # so that importing Agent (e.g. for get_state) does not pay for it
+        from model import Conv_QNet, Linear_QNet, QTrainer
+
+        if self.obs == "grid":
+            self.model = Conv_QNet(GRID_CHANNELS, 256, 3)
+        else:
+            self.model = Linear_QNet(STATE_SIZE, self.config.hidden_size, self.config.hidden_size2, 3)
+        self.trainer = QTrainer(self.model, lr=self.config.lr, gamma=self.gamma, target_sync=target_sync, tau=tau, n_step=n_step)
+
+        self.n_step = n_step
+        self.n_step_accumulator = NStepAccumulator(n_step, self.gamma) if n_step > 1 else None
+        self.update_every = update_every
+        self.n_steps = 0
 
 
-    def get_state(self, game):
+    def state_dict(self):
         """
-        We calculate the state from the game. The state is composed by 11 values.
+            Snapshot of everything needed to resume training: network, optimizer,
+            replay memory, counters and random state. Tensors and arrays are copies.
         """
-
-        # Get the snake head point
-        head = game.snake[0]
-
-        # Get points nearby
-        point_l = Point(head.x - 20, head.y)
-        point_r = Point(head.x + 20, head.y)
-        point_u = Point(head.x, head.y - 20)
-        point_d = Point(head.x, head.y + 20)
-        point_ll = Point(head.x - 40, head.y)
-        point_rr = Point(head.x + 40, head.y)
-        point_uu = Point(head.x, head.y - 40)
-        point_dd = Point(head.x, head.y + 40)
-
-
-        # Get the direction we are moving towards (one-hot encoding like)
-        dir_l = game.direction == Direction.LEFT
-        dir_r = game.direction == Direction.RIGHT
-        dir_u = game.direction == Direction.UP
-        dir_d = game.direction == Direction.DOWN
-        """# Danger diagonal straight
-            (dir_r and (game.is_collision(point_ru) or dir_r and game.is_collision(point_rd))) or
-            (dir_l and (game.is_collision(point_lu) or dir_l and game.is_collision(point_ld))),
-
-            # Danger diagonal left
-            (dir_l and (game.is_collision(point_ld) or game.is_collision(point_rd))) or
-            (dir_r and (game.is_collision(point_lu) or game.is_collision(point_ru))),
-
-            # Danger diagonal right
-            (dir_r and (game.is_collision(point_rd) or game.is_collision(point_ld))) or
-            (dir_l and (game.is_collision(point_ru) or game.is_collision(point_lu))),"""
+        return {
+            "model": copy.deepcopy(self.model.state_dict()),
+            "optimizer": copy.deepcopy(self.trainer.optimizer.state_dict()),
+            "target_model": (None if self.trainer.target_model is None
+                             else copy.deepcopy(self.trainer.target_model.state_dict())),
+            "memory": self.memory.state_dict(),
+            "n_games": self.n_games,
+            "n_steps": self.n_steps,
+            "trainer_steps": self.trainer.steps,
+            "rng": self.rng.bit_generator.state,
+            "memory_rng": self.memory.rng.bit_generator.state,
+        }
+
+    def load_state_dict(self, state):
+        self.model.load_state_dict(state["model"])
+        self.trainer.optimizer.load_state_dict(state["optimizer"])
+        if self.trainer.target_model is not None:
+            self.trainer.target_model.load_state_dict(state.get("target_model") or state["model"])
+        self.memory.load_state_dict(state["memory"])
+        self.n_games = state["n_games"]
+        self.n_steps = state.get("n_steps", 0)
+        self.trainer.steps = state.get("trainer_steps", 0)
+        self.rng.bit_generator.state = state["rng"]
+        if "memory_rng" in state:
+            self.memory.rng.bit_generator.state = state["memory_rng"]
+
+    def get_state(self, game, out=None):
         """
-        (dir_r and (game.is_collision(point_r) or game.is_collision(point_ru) or game.is_collision(point_rd))) or
-            (dir_l and (game.is_collision(point_l) or game.is_collision(point_lu) or game.is_collision(point_ld))) or
-            (dir_u and (game.is_collision(point_u) or game.is_collision(point_ru) or game.is_collision(point_lu))) or
-            (dir_d and (game.is_collision(point_d) or game.is_collision(point_ld) or game.is_collision(point_rd))),
-
-            # Danger right
-            (dir_u and (game.is_collision(point_r) or game.is_collision(point_ru) or game.is_collision(point_rd))) or
-            (dir_r and (game.is_collision(point_d) or game.is_collision(point_rd) or game.is_collision(point_ld))) or
-            (dir_l and (game.is_collision(point_u) or game.is_collision(point_ru) or game.is_collision(point_lu))) or
-            (dir_d and (game.is_collision(point_l) or game.is_collision(point_lu) or game.is_collision(point_ld))),
-
-            # Danger left
-            (dir_l and (game.is_collision(point_d) or game.is_collision(point_ld) or game.is_collision(point_rd))) or
-            (dir_r and (game.is_collision(point_u) or game.is_collision(point_lu) or game.is_collision(point_ru))) or
-            (dir_u and (game.is_collision(point_l) or game.is_collision(point_lu) or game.is_collision(point_ld))) or
-            (dir_d and (game.is_collision(point_r) or game.is_collision(point_ru) or game.is_collision(point_rd))),
+        We calculate the state from the game. The state is composed by 11 values:
+        danger straight/right/left, move direction and food location (see state_encoder),
+        or is the full board in "grid" mode.
+        'out' is an optional preallocated array to write the state into.
         """
-        state = [
-            # Danger straight
-            (dir_r and game.is_collision(point_r)) or
-            (dir_l and game.is_collision(point_l)) or
-            (dir_u and game.is_collision(point_u)) or
-            (dir_d and game.is_collision(point_d)),
-
-            # Danger right
-            (dir_u and game.is_collision(point_r)) or
-            (dir_r and game.is_collision(point_d)) or
-            (dir_l and game.is_collision(point_u)) or
-            (dir_d and game.is_collision(point_l)),
-
-            # Danger left
-            (dir_l and game.is_collision(point_d)) or
-            (dir_r and game.is_collision(point_u)) or
-            (dir_u and game.is_collision(point_l)) or
-            (dir_d and game.is_collision(point_r)),
-
-            # Move direction
-            dir_l, 
-            dir_r,
-            dir_u, 
-            dir_d,
-
-            # Food location
-            game.food.x < game.head.x, # food left
-            game.food.x > game.head.x, # food right
-            game.food.y < game.head.y, # food up
-            game.food.y > game.head.y # food down
-        ]
-
-        return np.array(state, dtype=int)
+        if self.obs == "grid":
+            # the grid is updated incrementally from the previous frame of the same game
+            if self._grid_encoder is None or self._grid_encoder.game is not game:
+                self._grid_encoder = GridEncoder(game)
+            return self._grid_encoder.encode(out)
+        return encode_state(game, out)
 
 
     def remember(self, state, action, reward, next_state, gameover):
-        # pop left if max memory is reached
-        self.memory.append((state, action, reward, next_state, gameover))
-
-    def train_long_memory(self):
-        if len(self.memory) > BATCH_SIZE:
-            batch = random.sample(self.memory, BATCH_SIZE) # list of BATCH_SIZE tuples
-        else:
-            batch = self.memory
-
-        states, actions, rewards, next_states, game_overs = zip(*batch)
-        self.trainer.train_step(np.array(states), np.array(actions), np.array(rewards), np.array(next_states), np.array(game_overs))
+        # 'action' is the index returned by get_action
+        # the oldest transition is overwritten if max memory is reached
+        if self.n_step_accumulator is None:
+            self.memory.push(state, action, reward, next_state, gameover)
+            return
+        for transition in self.n_step_accumulator.add(state, action, reward, next_state, gameover):
+            self.memory.push(*transition)
+
+    def train_long_memory(self, batch_size=None):
+        batch_size = batch_size or self.config.batch_size
+        if self.prioritized:
+            per_beta = self.config.per_beta
+            beta = min(1.0, per_beta + (1.0 - per_beta) * self.n_games / self.config.per_beta_games)
+            (states, actions, rewards, next_states, game_overs, weights), idx = self.memory.sample(batch_size, beta)
+            td_errors = self.trainer.train_step(states, actions, rewards, next_states, game_overs, weights)
+            # refresh the priorities of the replayed transitions
+            self.memory.update_priorities(idx, td_errors.numpy())
+            return
+
+        states, actions, rewards, next_states, game_overs = self.memory.sample(batch_size)
+        self.trainer.train_step(states, actions, rewards, next_states, game_overs)
     
     def train_short_memory(self, state, action, reward, next_state, game_over):
-        self.trainer.train_step(state, action, reward, next_state, game_over)
+        # a single 1-step transition, whatever n-step the memory holds
+        self.trainer.train_step(state, action, reward, next_state, game_over, n_step=1)
+
+    def train_step(self, state, action, reward, next_state, game_over):
+        """
+            Online update after each step: train_short_memory on the transition or, with 'update_every',
+            one batched replay update every 'update_every' steps.
+        """
+        if self.update_every is None:
+            self.train_short_memory(state, action, reward, next_state, game_over)
+            return
+        self.n_steps += 1
+        if self.n_steps % self.update_every == 0 and len(self.memory) >= self.config.update_batch_size:
+            self.train_long_memory(self.config.update_batch_size)
 
     def get_action(self, state):
+        """
+            Epsilon-greedy move for one state: the index of the action
+            (0 = straight, 1 = right turn, 2 = left turn) that SnakeGameAI.play_step consumes directly.
+        """
+        return int(self.get_actions(state[np.newaxis])[0])
+
+    def get_actions(self, states):
+        """
+            Epsilon-greedy moves for a batch of states, as an array of action indices.
+            The greedy moves come from one forward pass without autograd.
+        """
         # random moves: tradeoff between exploration / exploitation
-        self.eps = 80 - self.n_games # random function
-        final_move = [0,0,0]
-        if random.randint(0, 200) < self.eps:
-            # increasing n_games we don't get moves anymore
-            move = random.randint(0, 2)
-            final_move[move] = 1
-        else:
-            state0 = torch.tensor(state, dtype=torch.float)
-            prediction = self.model(state0)
-            move = torch.argmax(prediction).item() 
-            final_move[move] = 1
-        
-        return final_move
+        self.eps = self.config.eps_start - self.n_games # random function
+        n = len(states)
+        # increasing n_games we don't get random moves anymore
+        explore = self.rng.integers(0, self.config.eps_range + 1, size=n) < self.eps
+
+        if explore.all():
+            return self.rng.integers(0, 3, size=n)
+        import torch
+
+        with torch.inference_mode():
+            prediction = self.model(torch.from_numpy(np.asarray(states, dtype=np.float32)))
+            moves = torch.argmax(prediction, dim=1).numpy()
+        if explore.any():
+            moves[explore] = self.rng.integers(0, 3, size=int(explore.sum()))
+        return moves
     
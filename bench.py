@@ -0,0 +1,237 @@
+"""
+    Benchmark suite of the hot paths of the project.
+    Every benchmark runs with fixed seeds and the results are written as JSON, e.g.:
+        python bench.py --out results.json
+        python bench.py --only env get_state --quick
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+import torch
+
+# rendering benchmarks must work on machines without a display,
+# and pygame must not print its banner in the middle of the JSON on stdout
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+
+from agent import Agent, BATCH_SIZE, MAX_MEMORY
+from model import Linear_QNet, QTrainer
+from snake_game_ai import SnakeGameAI
+from vector_env import VectorSnakeEnv
+
+
+def _seed(seed):
+    random.seed(seed)
+    np.random.seed(seed)
+    torch.manual_seed(seed)
+
+
+def _random_moves(n, seed):
+    # mostly straight, so that games last long enough to measure something
+    return np.random.default_rng(seed).choice(3, size=n, p=[0.8, 0.1, 0.1])
+
+
+def bench_env(steps, seed, render=False):
+    """
+        SnakeGameAI.play_step steps/sec.
+    """
+    _seed(seed)
+    game = SnakeGameAI(render=render, seed=seed)
+    moves = _random_moves(steps, seed).tolist()
+    start = time.perf_counter()
+    for move in moves:
+        _, game_over, _ = game.play_step(move)
+        if game_over:
+            game.reset()
+    elapsed = time.perf_counter() - start
+    return {"steps": steps, "seconds": elapsed, "steps_per_sec": steps / elapsed}
+
+
+def bench_vector_env(n_games, steps, seed):
+    """
+        VectorSnakeEnv.step steps/sec, summed over all games.
+    """
+    env = VectorSnakeEnv(n_games, seed=seed)
+    moves = _random_moves(steps * n_games, seed).reshape(steps, n_games)
+    start = time.perf_counter()
+    for actions in moves:
+        env.step(actions)
+    elapsed = time.perf_counter() - start
+    return {"games": n_games, "steps": steps * n_games, "seconds": elapsed,
+            "steps_per_sec": steps * n_games / elapsed}
+
+
+def bench_get_state(calls, seed):
+    """
+        Agent.get_state calls/sec on a game in progress.
+    """
+    _seed(seed)
+    agent = Agent()
+    game = SnakeGameAI(seed=seed)
+    for move in _random_moves(50, seed).tolist():
+        if game.play_step(move)[1]:
+            game.reset()
+    start = time.perf_counter()
+    for _ in range(calls):
+        agent.get_state(game)
+    elapsed = time.perf_counter() - start
+    return {"calls": calls, "seconds": elapsed, "calls_per_sec": calls / elapsed}
+
+
+def bench_replay_sample(batches, seed):
+    """
+        Latency of the replay sampling done by Agent.train_long_memory, on a full memory.
+    """
+    _seed(seed)
+    agent = Agent(seed=seed)
+    rng = np.random.default_rng(seed)
+    agent.memory.push_batch(rng.integers(0, 2, size=(MAX_MEMORY, 11)),
+                            rng.integers(0, 3, size=MAX_MEMORY),
+                            rng.standard_normal(MAX_MEMORY),
+                            rng.integers(0, 2, size=(MAX_MEMORY, 11)),
+                            rng.random(MAX_MEMORY) < 0.01)
+    latencies = []
+    for _ in range(batches):
+        start = time.perf_counter()
+        agent.memory.sample(BATCH_SIZE)
+        latencies.append(time.perf_counter() - start)
+    latencies = np.array(latencies) * 1e3
+    return {"batches": batches, "batch_size": BATCH_SIZE,
+            "mean_ms": float(latencies.mean()), "p50_ms": float(np.percentile(latencies, 50)),
+            "p99_ms": float(np.percentile(latencies, 99))}
+
+
+def bench_train_step(batch_sizes, steps, seed):
+    """
+        QTrainer.train_step throughput (samples/sec) at several batch sizes.
+    """
+    results = {}
+    for batch_size in batch_sizes:
+        _seed(seed)
+        trainer = QTrainer(Linear_QNet(11, 256, 128, 3), lr=0.001, gamma=0.9)
+        rng = np.random.default_rng(seed)
+        states = rng.integers(0, 2, size=(batch_size, 11))
+        actions = rng.integers(0, 3, size=batch_size)
+        rewards = rng.standard_normal(batch_size)
+        next_states = rng.integers(0, 2, size=(batch_size, 11))
+        game_overs = rng.random(batch_size) < 0.01
+        if batch_size == 1:
+            # the single transition path of train_short_memory
+            states, actions, rewards, next_states, game_overs = (
+                states[0], int(actions[0]), float(rewards[0]), next_states[0], bool(game_overs[0]))
+
+        start = time.perf_counter()
+        for _ in range(steps):
+            trainer.train_step(states, actions, rewards, next_states, game_overs)
+        elapsed = time.perf_counter() - start
+        results[str(batch_size)] = {"steps": steps, "seconds": elapsed, "steps_per_sec": steps / elapsed,
+                                    "samples_per_sec": steps * batch_size / elapsed}
+    return results
+
+
+def bench_train(games, seed):
+    """
+        End-to-end games/sec of main.train (headless), output silenced.
+    """
+    import main
+
+    _seed(seed)
+    cwd = os.getcwd()
+    # new records are saved in ./best_model: keep them away from the real one
+    with tempfile.TemporaryDirectory() as tmp:
+        os.chdir(tmp)
+        try:
+            start = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()):
+                agent = main.train(max_games=games, seed=seed)
+            elapsed = time.perf_counter() - start
+        finally:
+            os.chdir(cwd)
+    return {"games": agent.n_games, "seconds": elapsed, "games_per_sec": agent.n_games / elapsed}
+
+
+# modules run or imported on their own (scripts and worker processes)
+ENTRY_POINTS = ["snake_game_ai", "state_encoder", "vector_env", "replay_buffer", "inference", "metrics",
+                "helper", "agent", "evaluate", "main"]
+HEAVY_MODULES = ["torch", "pygame", "matplotlib", "IPython"]
+
+
+def bench_startup(runs):
+    """
+        Import time of every entry point in a fresh interpreter (median of 'runs', interpreter
+        startup excluded) and the heavy dependencies that importing it loads.
+    """
+    here = os.path.dirname(os.path.abspath(__file__))
+    check = f"import sys; print(','.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))"
+
+    def median_time(code):
+        times = []
+        for _ in range(runs):
+            start = time.perf_counter()
+            out = subprocess.run([sys.executable, "-c", code], cwd=here, check=True,
+                                 capture_output=True, text=True).stdout
+            times.append(time.perf_counter() - start)
+        return float(np.median(times)), out.strip().splitlines()
+
+    baseline, _ = median_time("pass")
+    results = {"interpreter_ms": baseline * 1e3}
+    for module in ENTRY_POINTS:
+        seconds, out = median_time(f"import {module}; {check}")
+        loaded = out[-1] if out else ""
+        results[module] = {"import_ms": (seconds - baseline) * 1e3, "loads": loaded.split(",") if loaded else []}
+    return results
+
+
+BENCHMARKS = ["startup", "env", "env_render", "vector_env", "get_state", "replay_sample", "train_step", "train"]
+
+
+def run(only=None, quick=False, seed=0):
+    scale = 0.1 if quick else 1.0
+    n = lambda count: max(1, int(count * scale))
+    suite = {
+        "startup": lambda: bench_startup(max(1, n(5))),
+        "env": lambda: bench_env(n(50_000), seed),
+        "env_render": lambda: bench_env(n(300), seed, render=True),
+        "vector_env": lambda: bench_vector_env(1024, n(500), seed),
+        "get_state": lambda: bench_get_state(n(100_000), seed),
+        "replay_sample": lambda: bench_replay_sample(n(500), seed),
+        "train_step": lambda: bench_train_step([1, 32, 256, 1000], n(500), seed),
+        "train": lambda: bench_train(n(50), seed),
+    }
+
+    results = {}
+    for name in only or BENCHMARKS:
+        print(f"Running {name}...", file=sys.stderr, flush=True)
+        results[name] = suite[name]()
+    return {
+        "meta": {"seed": seed, "quick": quick, "python": platform.python_version(),
+                 "numpy": np.__version__, "torch": torch.__version__, "machine": platform.machine(),
+                 "torch_threads": torch.get_num_threads()},
+        "results": results,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--only", nargs="+", choices=BENCHMARKS, help="run only these benchmarks")
+    parser.add_argument("--quick", action="store_true", help="10x fewer iterations, for a smoke test")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", help="write the JSON results to this file (default: print them)")
+    args = parser.parse_args()
+
+    report = run(args.only, args.quick, args.seed)
+    text = json.dumps(report, indent=2)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(text)
+    print(text)
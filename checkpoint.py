@@ -0,0 +1,104 @@
+import glob
+import os
+import queue
+import threading
+
+import torch
+
+
+class CheckpointManager:
+    """
+        Saves training checkpoints in a background thread.
+        The state is snapshotted by the caller (e.g. Agent.state_dict) on the training thread,
+        then written atomically: a temporary file is renamed over the final name, so a crash
+        never leaves a truncated checkpoint. Only the last 'keep' checkpoints are kept.
+    """
+    def __init__(self, directory="checkpoints", keep=3):
+        self.directory = directory
+        self.keep = keep
+        os.makedirs(self.directory, exist_ok=True)
+
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._write_loop, daemon=True)
+        self._thread.start()
+
+    def save(self, state, step):
+        """
+            Queue the checkpoint 'state' of training step 'step' (e.g. the number of games) for writing.
+        """
+        path = os.path.join(self.directory, f"checkpoint_{step:09d}.pt")
+        self._queue.put((state, path, True))
+
+    def save_model(self, model, path):
+        """
+            Queue a copy of the weights of 'model' to be written to 'path' (e.g. the best model so far).
+        """
+        weights = {k: v.detach().clone() for k, v in model.state_dict().items()}
+        self._queue.put((weights, path, False))
+
+    def _write_loop(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                break
+            state, path, is_checkpoint = item
+            try:
+                _atomic_save(state, path)
+                if is_checkpoint:
+                    self._prune()
+            except Exception as e:
+                # a failed write (disk error, unpicklable state...) must not stop the next checkpoints:
+                # wait and close would block forever on a dead writer
+                print(f"Could not save {path}: {e!r}")
+            finally:
+                self._queue.task_done()
+
+    def _prune(self):
+        for path in self.checkpoints()[:-self.keep]:
+            os.remove(path)
+
+    def checkpoints(self):
+        # the zero-padded step makes the names sort in training order
+        return sorted(glob.glob(os.path.join(self.directory, "checkpoint_*.pt")))
+
+    def latest(self):
+        checkpoints = self.checkpoints()
+        return checkpoints[-1] if checkpoints else None
+
+    def load_latest(self):
+        """
+            The state of the latest checkpoint, or None if there is none.
+        """
+        self.wait()
+        path = self.latest()
+        if path is None:
+            return None
+        # checkpoints hold NumPy arrays and plain Python objects, not only tensors
+        return torch.load(path, weights_only=False)
+
+    def wait(self):
+        # block until the queued checkpoints are written
+        self._queue.join()
+
+    def close(self):
+        self.wait()
+        self._queue.put(None)
+        self._thread.join()
+
+
+def _atomic_save(state, path):
+    folder = os.path.dirname(path)
+    if folder:
+        os.makedirs(folder, exist_ok=True)
+    tmp_path = path + ".tmp"
+    try:
+        with open(tmp_path, "wb") as f:
+            torch.save(state, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        # no partial temporary file left behind
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
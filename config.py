@@ -0,0 +1,52 @@
+import argparse
+import dataclasses
+from dataclasses import dataclass
+
+
+@dataclass
+class TrainConfig:
+    """
+        Hyperparameters of the Agent. The defaults are the values the project has always trained with.
+        The exploration is epsilon-greedy: a move is random with probability
+        (eps_start - n_games) / eps_range, so it stops after 'eps_start' games.
+    """
+    lr: float = 0.001
+    gamma: float = 0.9
+    # replay memory size and batch size of train_long_memory
+    max_memory: int = 100_000
+    batch_size: int = 1000
+    # batch size of the updates done every 'update_every' steps and by the batched training
+    update_batch_size: int = 64
+    eps_start: int = 80
+    eps_range: int = 200
+    # hidden layers of Linear_QNet
+    hidden_size: int = 256
+    hidden_size2: int = 128
+    # prioritized replay: priority exponent and importance-sampling exponent,
+    # annealed from per_beta to 1 over per_beta_games games
+    per_alpha: float = 0.6
+    per_beta: float = 0.4
+    per_beta_games: int = 500
+
+    def replace(self, **changes):
+        return dataclasses.replace(self, **changes)
+
+
+def add_config_arguments(parser):
+    """
+        One command line option per field of TrainConfig (e.g. --lr, --hidden-size), defaulting to its value.
+    """
+    group = parser.add_argument_group("hyperparameters")
+    for field in dataclasses.fields(TrainConfig):
+        group.add_argument("--" + field.name.replace("_", "-"), type=field.type, default=field.default,
+                           help=f"default: {field.default}")
+    return parser
+
+
+def config_from_args(args):
+    """
+        The TrainConfig of the options added by add_config_arguments.
+    """
+    if isinstance(args, argparse.Namespace):
+        args = vars(args)
+    return TrainConfig(**{field.name: args[field.name] for field in dataclasses.fields(TrainConfig)})
@@ -0,0 +1,70 @@
+import numpy as np
+
+from metrics import RollingMetrics
+
+# Board sizes (cols, rows) of the stages, from the smallest to the full board of SnakeGameAI
+STAGES = ((8, 6), (12, 9), (16, 12), (24, 18), (32, 24))
+
+
+class Curriculum:
+    """
+        Board size scheduler: the games start on the smallest board of 'stages' and move to the next
+        board when the rolling mean score of the last 'window' games of the current stage reaches
+        'promote_fill' times the number of cells of the board (the score a snake needs to fill that
+        fraction of it).
+        New games get the board of the current stage, or with probability 'review' one of the smaller
+        boards already passed, so that a batch of games mixes sizes and what was learnt is not forgotten.
+    """
+    def __init__(self, stages=STAGES, window=100, promote_fill=0.05, review=0.2, seed=None):
+        self.stages = [tuple(size) for size in stages]
+        self.window = window
+        self.promote_fill = promote_fill
+        self.review = review
+        self.rng = np.random.default_rng(seed)
+        self.stage = 0
+        self.metrics = RollingMetrics(window)
+
+    @property
+    def size(self):
+        # board of the current stage
+        return self.stages[self.stage]
+
+    @property
+    def max_size(self):
+        # the largest board of the stages, the size of the env holding them all
+        return max(cols for cols, _ in self.stages), max(rows for _, rows in self.stages)
+
+    def sample(self, n):
+        """
+            Board sizes of 'n' new games, as (cols, rows) arrays.
+        """
+        stages = np.full(n, self.stage)
+        if self.stage > 0:
+            review = self.rng.random(n) < self.review
+            stages[review] = self.rng.integers(0, self.stage, size=int(review.sum()))
+        sizes = np.array(self.stages)[stages]
+        return sizes[:, 0], sizes[:, 1]
+
+    def add(self, score, cols, rows):
+        """
+            Record the score of a finished 'cols' x 'rows' game. Only the games of the current stage count.
+            Returns True when the curriculum moves to the next board.
+        """
+        if (cols, rows) != self.size:
+            return False
+        self.metrics.add(score)
+        if self.stage == len(self.stages) - 1 or self.metrics.n_games < self.window:
+            return False
+        if self.metrics.rolling_mean < self.promote_fill * cols * rows:
+            return False
+        self.stage += 1
+        self.metrics = RollingMetrics(self.window)
+        return True
+
+    def state_dict(self):
+        return {"stage": self.stage, "metrics": self.metrics.state_dict(), "rng": self.rng.bit_generator.state}
+
+    def load_state_dict(self, state):
+        self.stage = state["stage"]
+        self.metrics.load_state_dict(state["metrics"])
+        self.rng.bit_generator.state = state["rng"]
@@ -0,0 +1,136 @@
+"""
+    Score a saved model with greedy games, headless and in parallel, e.g.:
+        python evaluate.py best_model/model.pth --games 2000 --workers 4
+    Game i is seeded with 'seed + i', so two models evaluated with the same seed
+    play games with the same food random generators and can be compared directly.
+    With --plan-depth the moves are chosen by a beam search of that many moves ahead (see planner.py).
+"""
+import argparse
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import torch
+
+from model import Conv_QNet, Linear_QNet
+from planner import BeamPlanner
+from snake_game_ai import SnakeGameAI
+from state_encoder import GRID_CHANNELS, STATE_SIZE, GridEncoder, encode_state
+
+
+def load_model(path, obs="features"):
+    """
+        Load a model saved by Linear_QNet.save (a state_dict) or a training checkpoint (see checkpoint.py).
+    """
+    state = torch.load(path, weights_only=False)
+    if "agent" in state:
+        state = state["agent"]["model"]
+    if obs == "grid":
+        model = Conv_QNet(GRID_CHANNELS, 256, 3)
+    else:
+        # the hidden sizes are a hyperparameter (see config.TrainConfig): read them from the weights
+        model = Linear_QNet(STATE_SIZE, state["linear1.weight"].shape[0], state["linear2.weight"].shape[0], 3)
+    model.load_state_dict(state)
+    model.eval()
+    return model
+
+
+def _play(path, obs, seeds, batch_size, plan_depth=0, plan_width=16):
+    """
+        Play the games of 'seeds' greedily, 'batch_size' at a time with one forward pass per step
+        (or one beam search for all of them with 'plan_depth').
+        Returns one (seed, score, steps, timed_out) tuple per game.
+    """
+    # one thread per worker, the parallelism comes from the processes
+    torch.set_num_threads(1)
+    model = load_model(path, obs)
+    planner = BeamPlanner(model, plan_depth, plan_width) if plan_depth else None
+    results = []
+    for start in range(0, len(seeds), batch_size):
+        games = [SnakeGameAI(seed=seed) for seed in seeds[start:start + batch_size]]
+        encoders = [GridEncoder(game) for game in games] if obs == "grid" else None
+        active = list(range(len(games)))
+        while active:
+            if planner is not None:
+                moves = planner.plan([games[i] for i in active])
+            elif obs == "grid":
+                states = np.stack([encoders[i].encode() for i in active])
+            else:
+                states = np.stack([encode_state(games[i]) for i in active])
+            if planner is None:
+                with torch.inference_mode():
+                    moves = torch.argmax(model(torch.from_numpy(states.astype(np.float32))), dim=1).tolist()
+
+            still_active = []
+            for i, move in zip(active, moves):
+                game = games[i]
+                _, game_over, score = game.play_step(move)
+                if game_over:
+                    # the game ends on a collision or on the timeout
+                    results.append((seeds[start + i], score, game.frame_iteration, not game.is_collision()))
+                else:
+                    still_active.append(i)
+            active = still_active
+    return results
+
+
+def evaluate(path, n_games=1000, workers=None, seed=0, batch_size=64, obs="features", plan_depth=0, plan_width=16):
+    """
+        Play 'n_games' greedy (or planned, see _play) games spread across 'workers' processes and report
+        the score distribution, the mean game length, the timeout rate and the throughput.
+    """
+    workers = workers or os.cpu_count()
+    seeds = list(range(seed, seed + n_games))
+    chunks = [seeds[i::workers] for i in range(workers) if seeds[i::workers]]
+
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=len(chunks)) as pool:
+        futures = [pool.submit(_play, path, obs, chunk, batch_size, plan_depth, plan_width) for chunk in chunks]
+        results = sorted(r for future in futures for r in future.result())
+    elapsed = time.perf_counter() - start
+
+    scores = np.array([r[1] for r in results])
+    steps = np.array([r[2] for r in results])
+    timeouts = np.array([r[3] for r in results])
+    return {
+        "model": path,
+        "games": len(results),
+        "seed": seed,
+        "plan_depth": plan_depth,
+        "mean_score": float(scores.mean()),
+        "std_score": float(scores.std()),
+        "min_score": int(scores.min()),
+        "p50_score": float(np.percentile(scores, 50)),
+        "p90_score": float(np.percentile(scores, 90)),
+        "max_score": int(scores.max()),
+        "mean_length": float(steps.mean()),
+        "timeout_rate": float(timeouts.mean()),
+        "steps_per_sec": float(steps.sum() / elapsed),
+        "seconds": elapsed,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("model", nargs="?", default="best_model/model.pth", help="model or checkpoint to evaluate")
+    parser.add_argument("--games", type=int, default=1000)
+    parser.add_argument("--workers", type=int, help="number of processes (default: one per core)")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the first game")
+    parser.add_argument("--batch-size", type=int, default=64, help="games played together by each process")
+    parser.add_argument("--obs", choices=["features", "grid"], default="features")
+    parser.add_argument("--plan-depth", type=int, default=0, help="moves looked ahead by the beam search (0: greedy)")
+    parser.add_argument("--plan-width", type=int, default=16, help="branches of each game kept at every depth")
+    parser.add_argument("--out", help="also write the report to this JSON file")
+    args = parser.parse_args()
+    if args.plan_depth and args.obs == "grid":
+        parser.error("the planner works on the features of Linear_QNet, not on --obs grid")
+
+    report = evaluate(args.model, args.games, args.workers, args.seed, args.batch_size, args.obs,
+                      args.plan_depth, args.plan_width)
+    text = json.dumps(report, indent=2)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(text)
+    print(text)
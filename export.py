@@ -0,0 +1,86 @@
+"""
+    Export a trained Linear_QNet for inference only, e.g.:
+        python export.py best_model/model.pth --numpy best_model/model.npz --quantize
+        python export.py checkpoints/checkpoint_000000500.pt --torchscript best_model/model.ts
+    The NumPy export is served by inference.NumpyQNet, the TorchScript one with torch.jit.load.
+"""
+import argparse
+
+import numpy as np
+import torch
+import torch.nn as nn
+
+from evaluate import load_model
+
+
+def fold_linear(model):
+    """
+        The two layers of a Linear_QNet: the first one and its last two layers folded into one
+        (they have no activation in between), as (weight, bias) float64 arrays of shape (out, in).
+    """
+    w1 = model.linear1.weight.detach().double().numpy()
+    b1 = model.linear1.bias.detach().double().numpy()
+    w2 = model.linear2.weight.detach().double().numpy()
+    b2 = model.linear2.bias.detach().double().numpy()
+    w3 = model.linear3.weight.detach().double().numpy()
+    b3 = model.linear3.bias.detach().double().numpy()
+    return (w1, b1), (w3 @ w2, w3 @ b2 + b3)
+
+
+def _quantize(weight):
+    """
+        Symmetric int8 quantization with one scale per output feature of a (out, in) weight.
+    """
+    scale = np.abs(weight).max(axis=1, keepdims=True) / 127
+    scale[scale == 0] = 1
+    return np.round(weight / scale).astype(np.int8), scale.astype(np.float32)
+
+
+def export_numpy(model, path, quantize=False):
+    """
+        Save the folded weights of 'model', transposed to (in, out), in the .npz file 'path'.
+        With 'quantize' the weights are stored as int8 with their per-output scales.
+    """
+    arrays = {}
+    for name, (weight, bias) in zip(("w1", "w2"), fold_linear(model)):
+        if quantize:
+            weight, scale = _quantize(weight)
+            # (1, out): scales the columns of the transposed weight
+            arrays[name + "_scale"] = scale.T
+        arrays[name] = np.ascontiguousarray(weight.T, dtype=weight.dtype if quantize else np.float32)
+        arrays[name.replace("w", "b")] = bias.astype(np.float32)
+    np.savez(path, **arrays)
+
+
+def export_torchscript(model, path, quantize=False):
+    """
+        Save 'model' as a frozen TorchScript module. With 'quantize' its linear layers
+        run in int8 (dynamic quantization).
+    """
+    model = model.eval()
+    if quantize:
+        model = torch.ao.quantization.quantize_dynamic(model, {nn.Linear}, dtype=torch.qint8)
+    example = torch.zeros(1, model.linear1.in_features)
+    with torch.no_grad():
+        module = torch.jit.trace(model, example)
+    if not quantize:
+        # freezing inlines the weights as constants; quantized modules are saved as traced
+        module = torch.jit.freeze(module)
+    torch.jit.save(module, path)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("model", nargs="?", default="best_model/model.pth", help="model or checkpoint to export")
+    parser.add_argument("--numpy", help="write the NumPy export (.npz) to this file")
+    parser.add_argument("--torchscript", help="write the TorchScript export to this file")
+    parser.add_argument("--quantize", action="store_true", help="store the weights as int8")
+    args = parser.parse_args()
+    if not args.numpy and not args.torchscript:
+        parser.error("nothing to do: pass --numpy and/or --torchscript")
+
+    model = load_model(args.model)
+    if args.numpy:
+        export_numpy(model, args.numpy, args.quantize)
+    if args.torchscript:
+        export_torchscript(model, args.torchscript, args.quantize)
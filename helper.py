@@ -1,11 +1,11 @@
-import matplotlib.pyplot as plt
-from IPython import display
+import json
+import sys
+import time
 
-plt.ion()
 
 def plot(scores, mean_scores):
-    display.clear_output(wait=True)
-    display.display(plt.gcf())
+    import matplotlib.pyplot as plt
+
     plt.clf()
     plt.title('Training plot')
     plt.xlabel('Number of Games')
@@ -15,3 +15,48 @@ def plot(scores, mean_scores):
     plt.ylim(ymin=0)
     plt.text(len(scores)-1, scores[-1], str(scores[-1]))
     plt.text(len(mean_scores)-1, mean_scores[-1], str(mean_scores[-1]))
+
+
+def watch(path, interval=1.0):
+    """
+        Plot the metrics log written by main.train (see metrics.MetricsLog) while it grows.
+        This runs in its own process: the trainer never waits on the plot.
+    """
+    import matplotlib.pyplot as plt
+
+    plt.ion()
+    plt.figure()
+    scores = []
+    mean_scores = []
+    with open(path) as f:
+        while True:
+            # read whatever was appended since the last redraw
+            while True:
+                pos = f.tell()
+                line = f.readline()
+                if not line.endswith("\n"):
+                    # nothing new or a partial record: read it again at the next round
+                    f.seek(pos)
+                    break
+                record = json.loads(line)
+                scores.append(record["score"])
+                mean_scores.append(record["mean"])
+
+            if scores:
+                plot(scores, mean_scores)
+            plt.pause(interval)
+            if not plt.get_fignums():
+                # the window was closed
+                break
+
+
+if __name__ == "__main__":
+    path = sys.argv[1] if len(sys.argv) > 1 else "metrics.jsonl"
+    # the trainer may not have written anything yet
+    while True:
+        try:
+            open(path).close()
+            break
+        except FileNotFoundError:
+            time.sleep(1.0)
+    watch(path)
@@ -0,0 +1,60 @@
+"""
+    Forward pass of an exported Linear_QNet (see export.py) with NumPy only:
+    no torch, no pygame, nothing of the training imported.
+        net = NumpyQNet.load("best_model/model.npz")
+        move = net.act(state)          # one state of 11 features
+        moves = net.act_batch(states)  # (N, 11) states
+"""
+import numpy as np
+
+
+class NumpyQNet:
+    """
+        Linear_QNet folded into relu(x @ w1 + b1) @ w2 + b2: it has no activation between its last
+        two layers, so they are exported as one. The weights are stored transposed (in_features, out_features)
+        so that the matmuls read them contiguously.
+    """
+    def __init__(self, w1, b1, w2, b2):
+        self.w1 = np.ascontiguousarray(w1, dtype=np.float32)
+        self.b1 = np.ascontiguousarray(b1, dtype=np.float32)
+        self.w2 = np.ascontiguousarray(w2, dtype=np.float32)
+        self.b2 = np.ascontiguousarray(b2, dtype=np.float32)
+        # scratch buffer of the single state queries
+        self._hidden = np.empty(len(self.b1), dtype=np.float32)
+
+    @classmethod
+    def load(cls, path):
+        """
+            Load the weights written by export.export_numpy. int8 weights are dequantized
+            once here with their per-output scales.
+        """
+        with np.load(path) as data:
+            weights = {}
+            for name in ("w1", "w2"):
+                if name + "_scale" in data:
+                    weights[name] = data[name].astype(np.float32) * data[name + "_scale"]
+                else:
+                    weights[name] = data[name]
+            return cls(weights["w1"], data["b1"], weights["w2"], data["b2"])
+
+    def q_values(self, states):
+        """
+            Q values of a (N, 11) batch of states, or of a single state of 11 features.
+        """
+        states = np.asarray(states, dtype=np.float32)
+        if states.ndim == 1:
+            hidden = np.dot(states, self.w1, out=self._hidden)
+            hidden += self.b1
+            np.maximum(hidden, 0, out=hidden)
+            return hidden @ self.w2 + self.b2
+        hidden = states @ self.w1
+        hidden += self.b1
+        np.maximum(hidden, 0, out=hidden)
+        return hidden @ self.w2 + self.b2
+
+    def act(self, state):
+        # greedy move of a single state: 0 = straight, 1 = right turn, 2 = left turn
+        return int(np.argmax(self.q_values(state)))
+
+    def act_batch(self, states):
+        return np.argmax(self.q_values(states), axis=1)
@@ -1,62 +1,360 @@
-from helper import plot
+import argparse
+import subprocess
+import sys
+
 from agent import Agent
+from config import add_config_arguments, config_from_args
+from curriculum import Curriculum
+from metrics import MetricsLog, RollingMetrics
+from profiler import Profiler
+from recording import EpisodeRecorder, save_episode
 from snake_game_ai import SnakeGameAI
+from state_encoder import STATE_SIZE
+from transition_log import TransitionLogWriter
+from vector_env import VectorSnakeEnv
+
+import numpy as np
+
+# torch and the modules built on it (the distributed trainer, the checkpoints) are imported
+# only by the modes that use them: 'python main.py --help' and 'import main' stay fast
 
-import random
+# Games between two periodic checkpoints (a checkpoint is also saved at every new record)
+CHECKPOINT_EVERY = 100
+# Games between two profiling summaries
+PROFILE_EVERY = 100
 
-def train():
+
+def _changed_options(parser, args, names):
     """
-        Function to orchestrate all the training
+        The command line options among 'names' that were given a value other than their default.
     """
-    # utilities for plotting
-    plot_scores = []
-    plot_mean_scores = []
+    return ["--" + name.replace("_", "-") for name in names if getattr(args, name) != parser.get_default(name)]
+
+
+def train(render=False, prioritized=False, max_games=None, metrics_path=None, seed=None,
+          checkpoint_dir=None, resume=False, obs="features", n_step=1, target_sync=None, tau=None,
+          update_every=None, profile=False, trace_path=None, transitions_path=None, config=None,
+          record_path=None):
+    """
+        Function to orchestrate all the training.
+        The game is headless unless 'render' is set, so training runs at CPU speed.
+        'prioritized' makes the agent replay its memory by TD error instead of uniformly.
+        'obs' is the observation of the agent: "features" (11 values) or "grid" (full board, conv network).
+        'n_step', 'target_sync', 'tau' and 'update_every' are the learning options of the Agent.
+        The scores of the games are appended to the JSONL log 'metrics_path' (if any) in the background.
+        Training stops after 'max_games' games (never if None) and returns the agent.
+        With 'checkpoint_dir' the full training state is checkpointed in the background,
+        and 'resume' restarts from the latest checkpoint found there.
+        'profile' times every phase of the loop and prints a summary every PROFILE_EVERY games,
+        'trace_path' also writes them as a Chrome trace at the end.
+        Every transition is also appended to the on-disk log 'transitions_path' if given (see offline.py).
+        'config' holds the hyperparameters of the agent (see config.TrainConfig).
+        With 'record_path' the games that set a new record or end on the timeout are saved there
+        as seed and moves, to be replayed with recording.py.
+    """
+    if seed is not None:
+        import torch
+
+        torch.manual_seed(seed)
+
+    # utilities for tracking the scores and the time spent
+    metrics = RollingMetrics()
+    log = MetricsLog(metrics_path) if metrics_path else None
+    profiler = Profiler(enabled=profile or trace_path is not None, trace_path=trace_path)
 
     # variables
-    total_score = 0
     record = 0
-    agent = Agent()
-    game = SnakeGameAI()
+    game = SnakeGameAI(render=render, seed=seed)
+    agent = Agent(prioritized=prioritized, obs=obs, board_size=(game.cols, game.rows),
+                  n_step=n_step, target_sync=target_sync, tau=tau, update_every=update_every, config=config,
+                  seed=seed)
+    transitions = TransitionLogWriter(transitions_path, agent.memory.state_shape) if transitions_path else None
+    recorder = EpisodeRecorder() if record_path else None
+    if recorder is not None:
+        recorder.start(game)
+
+    checkpoints = None
+    if checkpoint_dir:
+        from checkpoint import CheckpointManager
+
+        checkpoints = CheckpointManager(checkpoint_dir)
+    if resume and checkpoints is not None:
+        state = checkpoints.load_latest()
+        if state is not None:
+            agent.load_state_dict(state["agent"])
+            metrics.load_state_dict(state["metrics"])
+            record = metrics.record
+            print(f"Resumed from game {agent.n_games} - Record: {record}")
     
     # Create the loop
-    while True:
+    while max_games is None or agent.n_games < max_games:
         # get old state
-        state_old = agent.get_state(game)
+        with profiler.phase("get_state"):
+            state_old = agent.get_state(game)
 
         # get move based on the current state
-        final_move = agent.get_action(state_old)
+        with profiler.phase("get_action"):
+            final_move = agent.get_action(state_old)
 
         # perform the move
-        reward, game_over, score = game.play_step(final_move)
+        with profiler.phase("play_step"):
+            reward, game_over, score = game.play_step(final_move)
+            if recorder is not None:
+                recorder.add(final_move)
         # get new state
-        state_new = agent.get_state(game)
+        with profiler.phase("get_state"):
+            state_new = agent.get_state(game)
 
-        # train short memory
-        agent.train_short_memory(state_old, final_move, reward, state_new, game_over)
+        # train short memory (or a batched replay update every few steps)
+        with profiler.phase("train_step"):
+            agent.train_step(state_old, final_move, reward, state_new, game_over)
 
         # remember
-        agent.remember(state_old, final_move, reward, state_new, game_over)
+        with profiler.phase("remember"):
+            agent.remember(state_old, final_move, reward, state_new, game_over)
+            if transitions is not None:
+                transitions.append(state_old, final_move, reward, state_new, game_over)
+        profiler.count("steps")
 
         if game_over:
+            # the game ends on a collision or on the timeout
+            timed_out = not game.is_collision()
             # train experience replay memory: train on all previous moves
             game.reset()
             agent.n_games += 1
-            agent.train_long_memory()
+            profiler.count("games")
+            with profiler.phase("train_long_memory"):
+                agent.train_long_memory()
 
-            if score > record:
+            new_record = score > record
+            if new_record:
                 record = score
-                agent.model.save()
+                if checkpoints is not None:
+                    checkpoints.save_model(agent.model, "./best_model/model.pth")
+                else:
+                    agent.model.save()
 
             print(f"--- Game: {agent.n_games} - Score: {score} - Record: {record} ---")
 
-            plot_scores.append(score)
-            total_score += score
-            mean_score = total_score / agent.n_games
-            plot_mean_scores.append(mean_score)
-            plot(plot_scores, plot_mean_scores)
+            if recorder is not None:
+                if new_record or timed_out:
+                    save_episode(record_path, recorder.finish(score), game=agent.n_games,
+                                 reason="record" if new_record else "timeout")
+                recorder.start(game)
+
+            with profiler.phase("metrics"):
+                metrics.add(score)
+                if log is not None:
+                    log.write({"score": score, "cycles": game.cycles_detected, **metrics.summary()})
+
+            if checkpoints is not None and (new_record or agent.n_games % CHECKPOINT_EVERY == 0):
+                with profiler.phase("checkpoint"):
+                    checkpoints.save({"agent": agent.state_dict(), "metrics": metrics.state_dict()}, agent.n_games)
+
+            if agent.n_games % PROFILE_EVERY == 0:
+                profiler.report()
+
+    if checkpoints is not None:
+        checkpoints.save({"agent": agent.state_dict(), "metrics": metrics.state_dict()}, agent.n_games)
+        checkpoints.close()
+    if log is not None:
+        log.close()
+    if transitions is not None:
+        transitions.close()
+    profiler.report()
+    profiler.write_trace()
+    return agent
+
+
+def train_batched(n_games=64, curriculum=False, max_games=None, metrics_path=None, seed=None,
+                  checkpoint_dir=None, resume=False, profile=False, trace_path=None, transitions_path=None,
+                  config=None, callback=None, prioritized=False, target_sync=None, tau=None):
+    """
+        Train one network on 'n_games' games stepped together (see VectorSnakeEnv):
+        one forward pass chooses the moves of all the games, the transitions go to the replay memory
+        in one batch and every step ends with one batched replay update.
+        With 'curriculum' the games start on small boards that grow with the score (see Curriculum),
+        and games of different sizes share the batch; otherwise every game is played on the full board.
+        The other options are the ones of 'train'; the observation is the 11 state features,
+        which do not depend on the board size, and the memory holds 1-step transitions.
+        'callback(agent, metrics, env_steps)' is called after every finished game, training stops
+        when it returns True (e.g. to prune a trial of a sweep).
+    """
+    if seed is not None:
+        import torch
+
+        torch.manual_seed(seed)
+
+    metrics = RollingMetrics()
+    log = MetricsLog(metrics_path) if metrics_path else None
+    profiler = Profiler(enabled=profile or trace_path is not None, trace_path=trace_path)
+
+    record = 0
+    agent = Agent(prioritized=prioritized, target_sync=target_sync, tau=tau, config=config, seed=seed)
+    schedule = Curriculum(seed=seed) if curriculum else None
+    cols, rows = schedule.max_size if schedule is not None else (None, None)
+    env = VectorSnakeEnv(n_games, seed=seed, cols=cols, rows=rows)
+    full_size = (env.cols, env.rows)
+    env_steps = 0
+    transitions = TransitionLogWriter(transitions_path, STATE_SIZE) if transitions_path else None
+
+    checkpoints = None
+    if checkpoint_dir:
+        from checkpoint import CheckpointManager
+
+        checkpoints = CheckpointManager(checkpoint_dir)
+    if resume and checkpoints is not None:
+        state = checkpoints.load_latest()
+        if state is not None:
+            agent.load_state_dict(state["agent"])
+            metrics.load_state_dict(state["metrics"])
+            if schedule is not None and state.get("curriculum") is not None:
+                schedule.load_state_dict(state["curriculum"])
+            env_steps = state.get("env_steps", 0)
+            record = metrics.record
+            print(f"Resumed from game {agent.n_games} - Record: {record}")
+    if schedule is not None:
+        env.resize(np.arange(n_games), *schedule.sample(n_games))
+
+    def snapshot():
+        return {"agent": agent.state_dict(), "metrics": metrics.state_dict(), "env_steps": env_steps,
+                "curriculum": schedule.state_dict() if schedule is not None else None}
+
+    states = np.zeros((n_games, STATE_SIZE), dtype=int)
+    next_states = np.zeros((n_games, STATE_SIZE), dtype=int)
+    env.observe(states)
+    stopped = False
+    while (max_games is None or agent.n_games < max_games) and not stopped:
+        with profiler.phase("get_actions"):
+            actions = agent.get_actions(states)
+        # the board sizes of the games that end in this step
+        board_cols = env.board_cols.copy()
+        board_rows = env.board_rows.copy()
+        with profiler.phase("step"):
+            rewards, game_overs, scores = env.step(actions)
+            # finished games are already reset: their next state is unused since they are terminal
+            env.observe(next_states)
+        env_steps += n_games
+        profiler.count("steps", n_games)
+
+        with profiler.phase("remember"):
+            agent.memory.push_batch(states, actions, rewards, next_states, game_overs)
+            if transitions is not None:
+                transitions.append_batch(states, actions, rewards, next_states, game_overs)
+        with profiler.phase("train"):
+            if len(agent.memory) >= agent.config.update_batch_size:
+                agent.train_long_memory(agent.config.update_batch_size)
+        states, next_states = next_states, states
+
+        finished = np.flatnonzero(game_overs)
+        if len(finished) == 0:
+            continue
+        profiler.count("games", len(finished))
+        with profiler.phase("metrics"):
+            for i in finished:
+                score = int(scores[i])
+                size = (int(board_cols[i]), int(board_rows[i]))
+                agent.n_games += 1
+                metrics.add(score)
+                if size == full_size and score > record:
+                    # records only count on the full board
+                    record = score
+                    if checkpoints is not None:
+                        checkpoints.save_model(agent.model, "./best_model/model.pth")
+                    else:
+                        agent.model.save()
+                if schedule is not None and schedule.add(score, *size):
+                    print(f"--- Curriculum: moving to the {schedule.size[0]}x{schedule.size[1]} board ---")
+                if log is not None:
+                    log.write({"score": score, "board": size, "env_steps": env_steps, **metrics.summary()})
+                if checkpoints is not None and agent.n_games % CHECKPOINT_EVERY == 0:
+                    checkpoints.save(snapshot(), agent.n_games)
+                if agent.n_games % PROFILE_EVERY == 0:
+                    print(f"--- Game: {agent.n_games} - Steps: {env_steps} - Mean: {metrics.rolling_mean:.2f} "
+                          f"- Record: {record} ---")
+                    profiler.report()
+                if callback is not None and callback(agent, metrics, env_steps):
+                    stopped = True
+                    break
+
+        if schedule is not None:
+            # the finished games start again on a board of the current curriculum
+            env.resize(finished, *schedule.sample(len(finished)))
+            env.observe(states)
+
+    if checkpoints is not None:
+        checkpoints.save(snapshot(), agent.n_games)
+        checkpoints.close()
+    if log is not None:
+        log.close()
+    if transitions is not None:
+        transitions.close()
+    profiler.report()
+    profiler.write_trace()
+    return agent
 
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--render", action="store_true", help="watch the games while training")
+    parser.add_argument("--prioritized", action="store_true", help="use prioritized experience replay")
+    parser.add_argument("--actors", type=int, default=0,
+                        help="number of actor processes feeding a central learner (0 = single process)")
+    parser.add_argument("--batch", type=int, default=0,
+                        help="number of games stepped together with one shared network (0 = a single game)")
+    parser.add_argument("--curriculum", action="store_true",
+                        help="with --batch, start on small boards that grow with the score")
+    parser.add_argument("--metrics", default="metrics.jsonl", help="JSONL log of the scores")
+    parser.add_argument("--plot", action="store_true", help="plot the metrics log live in a separate process")
+    parser.add_argument("--obs", choices=["features", "grid"], default="features",
+                        help="observation: the 11 state features or the full board with a conv network")
+    parser.add_argument("--n-step", type=int, default=1, help="rewards summed in the stored transitions")
+    parser.add_argument("--target-sync", type=int, help="copy the model into a target network every N updates")
+    parser.add_argument("--tau", type=float, help="Polyak averaging rate of a target network")
+    parser.add_argument("--update-every", type=int,
+                        help="one batched replay update every N steps instead of a single-sample update per step")
+    parser.add_argument("--profile", action="store_true", help="print where the time goes, phase by phase")
+    parser.add_argument("--trace", help="write the profiled phases to this Chrome trace file")
+    parser.add_argument("--record", metavar="PATH",
+                        help="save the record and timed out games to this file, to replay them with recording.py")
+    parser.add_argument("--log-transitions", metavar="PATH",
+                        help="also append every transition to this on-disk log, for offline.py")
+    parser.add_argument("--checkpoints", default="checkpoints", help="directory of the training checkpoints")
+    parser.add_argument("--resume", action="store_true", help="resume from the latest checkpoint")
+    add_config_arguments(parser)
+    args = parser.parse_args()
+    config = config_from_args(args)
+    if args.actors > 0:
+        unsupported = _changed_options(parser, args, ["batch", "curriculum", "resume", "checkpoints", "profile",
+                                                      "trace", "log_transitions", "obs", "n_step",
+                                                      "update_every", "render", "record"])
+        if unsupported:
+            parser.error(f"{', '.join(unsupported)} cannot be used with --actors")
+    elif args.batch > 0:
+        unsupported = _changed_options(parser, args, ["obs", "n_step", "update_every", "render", "record"])
+        if unsupported:
+            parser.error(f"{', '.join(unsupported)} cannot be used with --batch")
+    elif args.curriculum:
+        parser.error("--curriculum needs --batch")
+
+    if args.plot:
+        subprocess.Popen([sys.executable, "helper.py", args.metrics])
+
     print("Game started.")
-    train()
+    if args.actors > 0:
+        from actor_learner import train_distributed
+
+        train_distributed(n_actors=args.actors, prioritized=args.prioritized, metrics_path=args.metrics,
+                          config=config, target_sync=args.target_sync, tau=args.tau)
+    elif args.batch > 0:
+        train_batched(n_games=args.batch, curriculum=args.curriculum, metrics_path=args.metrics,
+                      checkpoint_dir=args.checkpoints, resume=args.resume, profile=args.profile,
+                      trace_path=args.trace, transitions_path=args.log_transitions, config=config,
+                      prioritized=args.prioritized, target_sync=args.target_sync, tau=args.tau)
+    else:
+        train(render=args.render, prioritized=args.prioritized, metrics_path=args.metrics,
+              checkpoint_dir=args.checkpoints, resume=args.resume, obs=args.obs, n_step=args.n_step,
+              target_sync=args.target_sync, tau=args.tau, update_every=args.update_every,
+              profile=args.profile, trace_path=args.trace, transitions_path=args.log_transitions,
+              config=config, record_path=args.record)
     print("Game finished")
\ No newline at end of file
@@ -0,0 +1,87 @@
+import json
+import queue
+import threading
+
+import numpy as np
+
+
+class RollingMetrics:
+    """
+        Training scores kept in a fixed-size ring: running totals over all the games
+        and mean/percentiles over the last 'window' games, in constant memory.
+    """
+    def __init__(self, window=100):
+        self.window = np.zeros(window, dtype=np.float64)
+        self.pos = 0
+        self.n_games = 0
+        self.total_score = 0
+        self.record = 0
+
+    def add(self, score):
+        self.window[self.pos] = score
+        self.pos = (self.pos + 1) % len(self.window)
+        self.n_games += 1
+        self.total_score += score
+        self.record = max(self.record, score)
+
+    @property
+    def mean(self):
+        # mean score over all the games played so far
+        return self.total_score / max(self.n_games, 1)
+
+    def _recent(self):
+        return self.window[:min(self.n_games, len(self.window))]
+
+    @property
+    def rolling_mean(self):
+        recent = self._recent()
+        return float(recent.mean()) if len(recent) else 0.0
+
+    def percentile(self, q):
+        recent = self._recent()
+        return float(np.percentile(recent, q)) if len(recent) else 0.0
+
+    def state_dict(self):
+        return {"window": self.window.copy(), "pos": self.pos, "n_games": self.n_games,
+                "total_score": self.total_score, "record": self.record}
+
+    def load_state_dict(self, state):
+        self.window[:] = state["window"]
+        self.pos = state["pos"]
+        self.n_games = state["n_games"]
+        self.total_score = state["total_score"]
+        self.record = state["record"]
+
+    def summary(self):
+        return {"game": self.n_games, "record": self.record, "mean": self.mean,
+                "rolling_mean": self.rolling_mean, "p50": self.percentile(50), "p90": self.percentile(90)}
+
+
+class MetricsLog:
+    """
+        Append-only JSONL log of training records written by a background thread,
+        so that the training loop never waits on the disk. Read it with helper.watch to plot it live.
+    """
+    def __init__(self, path):
+        self.path = path
+        self._queue = queue.SimpleQueue()
+        self._thread = threading.Thread(target=self._write_loop, daemon=True)
+        self._thread.start()
+
+    def write(self, record):
+        self._queue.put(record)
+
+    def _write_loop(self):
+        with open(self.path, "a") as f:
+            while True:
+                record = self._queue.get()
+                if record is None:
+                    break
+                f.write(json.dumps(record) + "\n")
+                # flush when there is nothing else to write, so that readers see the records quickly
+                if self._queue.empty():
+                    f.flush()
+
+    def close(self):
+        self._queue.put(None)
+        self._thread.join()
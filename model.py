@@ -2,9 +2,23 @@ import torch
 import torch.nn as nn
 import torch.optim as optim
 import torch.nn.functional as F
+import copy
 import os
 
-class Linear_QNet(nn.Module):
+class QNet(nn.Module):
+    """
+        Base of the Q networks: how they are saved.
+    """
+    def save(self, file_name='model.pth'):
+        model_folder_path = "./best_model"
+        if not os.path.exists(model_folder_path):
+            os.makedirs(model_folder_path)
+        
+        file_name = os.path.join(model_folder_path, file_name)
+        torch.save(self.state_dict(), file_name)
+
+
+class Linear_QNet(QNet):
     def __init__(self, input_size, hidden_size, hidden_size2, output_size) -> None:
         super().__init__()
         self.linear1 = nn.Linear(input_size, hidden_size)
@@ -16,60 +30,117 @@ class Linear_QNet(nn.Module):
         x = self.linear2(x)
         x = self.linear3(x)
         return x
-    
-    def save(self, file_name='model.pth'):
-        model_folder_path = "./best_model"
-        if not os.path.exists(model_folder_path):
-            os.makedirs(model_folder_path)
-        
-        file_name = os.path.join(model_folder_path, file_name)
-        torch.save(self.state_dict(), file_name)
+
+
+class Conv_QNet(QNet):
+    """
+        Small convolutional Q network over the full board (see state_encoder.GridEncoder):
+        input (N, channels, rows, cols), output one Q value per action.
+        The adaptive pooling makes it work on any board size.
+    """
+    def __init__(self, in_channels, hidden_size, output_size) -> None:
+        super().__init__()
+        self.conv1 = nn.Conv2d(in_channels, 16, kernel_size=3, padding=1)
+        self.conv2 = nn.Conv2d(16, 32, kernel_size=3, stride=2, padding=1)
+        self.conv3 = nn.Conv2d(32, 32, kernel_size=3, stride=2, padding=1)
+        self.pool = nn.AdaptiveAvgPool2d((6, 8))
+        self.linear1 = nn.Linear(32 * 6 * 8, hidden_size)
+        self.linear2 = nn.Linear(hidden_size, output_size)
+
+    def forward(self, x):
+        x = F.relu(self.conv1(x))
+        x = F.relu(self.conv2(x))
+        x = F.relu(self.conv3(x))
+        x = torch.flatten(self.pool(x), start_dim=1)
+        x = F.relu(self.linear1(x))
+        x = self.linear2(x)
+        return x
 
 
 class QTrainer:
-    def __init__(self, model, lr, gamma) -> None:
+    """
+        Q-learning updates of 'model'.
+        The bootstrap Q values come from a target network when 'target_sync' (hard copy of the model
+        every 'target_sync' steps) or 'tau' (Polyak averaging after every step) is set, from the model otherwise.
+        'n_step' is the number of rewards summed in the transitions, which are bootstrapped with gamma^n_step.
+    """
+    def __init__(self, model, lr, gamma, target_sync=None, tau=None, n_step=1) -> None:
         self.lr = lr
         self.gamma = gamma
+        self.n_step = n_step
         self.model = model
         self.optimizer = optim.Adam(model.parameters(), lr=self.lr)
         #self.optimizer = optim.SGD(model.parameters(), lr=self.lr)
         self.criterion = nn.MSELoss()
 
-    def train_step(self, state, action, reward, next_state, game_over):
-        state = torch.tensor(state, dtype=torch.float)
-        action = torch.tensor(action, dtype=torch.long)
-        next_state = torch.tensor(next_state, dtype=torch.float)
-        reward = torch.tensor(reward, dtype=torch.float)
+        self.target_sync = target_sync
+        self.tau = tau
+        self.target_model = None
+        if self.target_sync or self.tau:
+            self.target_model = copy.deepcopy(model)
+            self.target_model.requires_grad_(False)
+        self.steps = 0
 
-        if len(state.shape) == 1:
-            # (1, x) 
+    def sync_target(self):
+        if self.tau:
+            with torch.no_grad():
+                for target, param in zip(self.target_model.parameters(), self.model.parameters()):
+                    target.lerp_(param, self.tau)
+        else:
+            self.target_model.load_state_dict(self.model.state_dict())
+
+    def train_step(self, state, action, reward, next_state, game_over, weights=None, n_step=None):
+        """
+            One optimizer step on a batch (or a single transition).
+            'weights' are optional importance-sampling weights of the samples in the loss.
+            'n_step' overrides the number of rewards summed in these transitions.
+            Returns the TD errors (Q_new - Q) of the batch.
+        """
+        state = torch.as_tensor(state, dtype=torch.float)
+        action = torch.as_tensor(action, dtype=torch.long)
+        next_state = torch.as_tensor(next_state, dtype=torch.float)
+        reward = torch.as_tensor(reward, dtype=torch.float)
+
+        if reward.dim() == 0:
+            # single transition: (1, ...) 
             state = torch.unsqueeze(state, 0)
             next_state = torch.unsqueeze(next_state, 0)
             action = torch.unsqueeze(action, 0)
             reward = torch.unsqueeze(reward, 0)
             game_over = (game_over, )
+
+        # actions can be one-hot rows or indices of the action taken
+        if action.dim() > 1:
+            action = torch.argmax(action, dim=1)
         
         # 1. Predicted Q values with current state
         pred = self.model(state)
 
-        # 2. Q_new = R + gamma * max(next_predicted Q value) -> only if not gameover
-        
-        target = pred.clone()
-        for idx in range(len(game_over)):
-            Q_new = reward[idx]
-            if not game_over[idx]:
-                Q_new = reward[idx] + self.gamma * torch.max(self.model(next_state[idx]))
+        # 2. Q_new = R + gamma^n * max(next_predicted Q value) -> only if not gameover
+        # one forward pass for the whole batch, terminal transitions are masked out
+        bootstrap_model = self.model if self.target_model is None else self.target_model
+        with torch.no_grad():
+            next_q = bootstrap_model(next_state).max(dim=1)[0]
+        not_over = ~torch.as_tensor(game_over, dtype=torch.bool)
+        discount = self.gamma ** (self.n_step if n_step is None else n_step)
+        Q_new = reward + discount * next_q * not_over
 
-            target[idx][torch.argmax(action).item()] = Q_new
+        # only the Q value of the action taken moves towards Q_new
+        target = pred.detach().clone()
+        target.scatter_(1, action.unsqueeze(1), Q_new.unsqueeze(1))
         
         self.optimizer.zero_grad()
-        loss = self.criterion(target, pred) # Q_new and Q
+        if weights is None:
+            loss = self.criterion(target, pred) # Q_new and Q
+        else:
+            weights = torch.as_tensor(weights, dtype=torch.float)
+            loss = (weights * ((target - pred) ** 2).mean(dim=1)).mean()
         loss.backward()
 
         self.optimizer.step()
 
+        self.steps += 1
+        if self.tau or self.target_sync and self.steps % self.target_sync == 0:
+            self.sync_target()
 
-
-
-
-
+        return (target - pred.detach()).gather(1, action.unsqueeze(1)).squeeze(1)
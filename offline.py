@@ -0,0 +1,71 @@
+"""
+    Train a Q network on the transitions of a log written by main.py --log-transitions, e.g.:
+        python offline.py transitions.bin --steps 20000 --lr 0.0005 --hidden-size 128
+    No game is played: the same collected experience can be reused across runs and hyperparameters
+    (e.g. the best ones of a sweep, see sweep.py).
+"""
+import argparse
+
+import numpy as np
+import torch
+
+from agent import DEFAULT_CONFIG
+from config import add_config_arguments, config_from_args
+from evaluate import load_model
+from model import Conv_QNet, Linear_QNet, QTrainer
+from state_encoder import GRID_CHANNELS, STATE_SIZE
+from transition_log import TransitionLog
+
+# Steps between two progress reports
+REPORT_EVERY = 1000
+
+
+def train_offline(log_path, steps=10_000, config=None, target_sync=None, tau=None,
+                  init_model=None, seed=0, file_name="offline_model.pth"):
+    """
+        'steps' QTrainer updates on random mini-batches of the transition log 'log_path'.
+        The network ("features" or "grid") follows the states of the log; it starts from the weights
+        of 'init_model' if given. The learning rate, discount, batch size and hidden sizes come from
+        'config' (a config.TrainConfig, the defaults if None).
+        The trained model is saved as best_model/'file_name' and returned.
+    """
+    config = config or DEFAULT_CONFIG
+    torch.manual_seed(seed)
+    log = TransitionLog(log_path, seed=seed)
+    if len(log) == 0:
+        raise ValueError(f"the transition log {log_path} holds no transitions")
+    obs = "grid" if len(log.state_shape) > 1 else "features"
+    if init_model is not None:
+        model = load_model(init_model, obs)
+        model.train()
+    elif obs == "grid":
+        model = Conv_QNet(GRID_CHANNELS, 256, 3)
+    else:
+        model = Linear_QNet(STATE_SIZE, config.hidden_size, config.hidden_size2, 3)
+    trainer = QTrainer(model, lr=config.lr, gamma=config.gamma, target_sync=target_sync, tau=tau)
+    print(f"Training on {len(log)} transitions")
+
+    td_errors = []
+    for step in range(1, steps + 1):
+        td_errors.append(float(trainer.train_step(*log.sample(config.batch_size)).abs().mean()))
+        if step % REPORT_EVERY == 0:
+            print(f"--- Step: {step} - Mean |TD error|: {np.mean(td_errors):.4f} ---")
+            td_errors = []
+    model.save(file_name)
+    return model
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("log", nargs="?", default="transitions.bin", help="transition log to train on")
+    parser.add_argument("--steps", type=int, default=10_000)
+    parser.add_argument("--target-sync", type=int, help="copy the model into a target network every N updates")
+    parser.add_argument("--tau", type=float, help="Polyak averaging rate of a target network")
+    parser.add_argument("--init", help="model or checkpoint to start from")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", default="offline_model.pth", help="file name of the model in best_model/")
+    add_config_arguments(parser)
+    args = parser.parse_args()
+
+    train_offline(args.log, args.steps, config_from_args(args), args.target_sync, args.tau,
+                  args.init, args.seed, args.out)
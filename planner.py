@@ -0,0 +1,108 @@
+"""
+    Beam search lookahead guided by the Q values of a trained Linear_QNet: before every move the branches
+    of the games are played a few moves ahead and the first move of the best branch is played, e.g.:
+        python evaluate.py best_model/model.pth --plan-depth 4 --plan-width 24
+    The branches of all the games live in one VectorSnakeEnv: every depth level is one batched
+    state encoding, one forward pass and one batched step, whatever the number of branches.
+"""
+import numpy as np
+
+from state_encoder import STATE_SIZE
+from vector_env import VectorSnakeEnv
+
+# Weight of each of the 0/1 state features in the index of the state
+_STATE_BITS = 1 << np.arange(STATE_SIZE)
+
+
+class BeamPlanner:
+    """
+        Plays the branches of every game 'depth' moves ahead. At each depth, every branch is expanded with
+        its 3 moves and the 'width' best candidates of each game, ranked by their discounted rewards so far
+        plus the Q value of the move, are played. A branch is worth its discounted rewards plus the discounted
+        best Q value of its last state (nothing after a game over); every game plays the first move of its
+        best branch. 'model' is a torch Linear_QNet or a NumpyQNet (see inference.py).
+        The food eaten in a branch is placed at random again: the planner does not see the food generators of the games.
+        The branches of a game draw it from a generator seeded with the episode seed and the frame of the game
+        (and 'seed'), so the plan of a game does not depend on the other games planned with it.
+    """
+    def __init__(self, model, depth=3, width=16, gamma=0.9, seed=None):
+        if depth < 1 or width < 1:
+            raise ValueError("the planner needs a depth and a width of at least 1")
+        self.model = model
+        self.depth = depth
+        self.width = width
+        self.gamma = gamma
+        self.seed = seed
+        # Q values of the 2**STATE_SIZE possible states, computed once
+        self._table = None
+
+    def q_values(self, states):
+        """
+            Q values of a (N, STATE_SIZE) batch of states, read from a table of all the possible states:
+            a state always gets the same values, whatever its position in the batch and the other games
+            planned with it (the forward pass of a batch may differ in the last bits from row to row).
+        """
+        if self._table is None:
+            all_states = (np.arange(2 ** STATE_SIZE)[:, np.newaxis] & _STATE_BITS) > 0
+            self._table = self._forward(all_states.astype(np.float32))
+        return self._table[np.asarray(states) @ _STATE_BITS]
+
+    def _forward(self, states):
+        if hasattr(self.model, "q_values"):
+            return self.model.q_values(states)
+        import torch
+
+        with torch.inference_mode():
+            return self.model(torch.from_numpy(states)).numpy()
+
+    def plan(self, games):
+        """
+            The move (0 = straight, 1 = right turn, 2 = left turn) of each SnakeGameAI of 'games'.
+        """
+        n = len(games)
+        extra = [] if self.seed is None else [self.seed]
+        rngs = [np.random.default_rng([*extra, game.episode_seed, game.frame_iteration]) for game in games]
+        env = VectorSnakeEnv.from_games(games, auto_reset=False, rngs=rngs)
+        # game and first move of every branch, and its discounted rewards so far
+        root = np.arange(n)
+        first = np.zeros(n, dtype=np.int64)
+        returns = np.zeros(n)
+        best = np.full((n, 3), -np.inf)
+
+        for depth in range(self.depth + 1):
+            q = self.q_values(env.observe())
+            discount = self.gamma ** depth
+            if depth == self.depth:
+                # 3. leaves: bootstrap with the best Q value of their state
+                np.maximum.at(best, (root, first), returns + discount * q.max(axis=1))
+                break
+
+            # 1. expand every branch with its 3 moves and keep the 'width' best candidates of each game
+            scores = (returns[:, np.newaxis] + discount * q).reshape(-1)
+            candidates = np.repeat(root, 3)
+            order = np.lexsort((-scores, candidates))
+            rank = np.arange(len(order)) - np.searchsorted(candidates[order], candidates[order])
+            keep = order[rank < self.width]
+            parent = keep // 3
+            moves = keep % 3
+
+            # 2. play the candidates
+            env = env.take(parent)
+            rewards, game_over, _ = env.step(moves)
+            root = root[parent]
+            first = moves if depth == 0 else first[parent]
+            returns = returns[parent] + discount * rewards
+            if game_over.any():
+                np.maximum.at(best, (root[game_over], first[game_over]), returns[game_over])
+                alive = np.flatnonzero(~game_over)
+                if len(alive) == 0:
+                    break
+                env = env.take(alive)
+                root = root[alive]
+                first = first[alive]
+                returns = returns[alive]
+
+        return np.argmax(best, axis=1).tolist()
+
+    def act(self, game):
+        return self.plan([game])[0]
@@ -0,0 +1,123 @@
+import contextlib
+import json
+import os
+import threading
+import time
+
+import numpy as np
+
+_NULL_PHASE = contextlib.nullcontext()
+
+
+class _PhaseTimer:
+    """
+        Context manager timing one phase. There is one per phase name, reused at every call.
+    """
+    __slots__ = ("profiler", "name", "start")
+
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+        self.start = 0
+
+    def __enter__(self):
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc):
+        self.profiler._record(self.name, self.start, time.perf_counter_ns())
+        return False
+
+
+class Profiler:
+    """
+        Per-phase wall time of a loop, e.g.:
+            with profiler.phase("play_step"):
+                game.play_step(move)
+        Every phase keeps its total time and call count plus the last 'max_samples' durations for the percentiles.
+        When disabled 'phase' returns a shared no-op context manager, so the instrumentation can stay in the loop.
+        With 'trace_path' the phases are also saved as a Chrome trace (open it in chrome://tracing or Perfetto).
+    """
+    def __init__(self, enabled=True, max_samples=10_000, trace_path=None, max_trace_events=1_000_000):
+        self.enabled = enabled
+        self.max_samples = max_samples
+        self.trace_path = trace_path
+        self.max_trace_events = max_trace_events
+
+        self._timers = {}
+        self._totals = {}
+        self._calls = {}
+        self._samples = {}
+        self.counters = {}
+        self._trace = []
+        self._started = time.perf_counter_ns()
+        self._pid = os.getpid()
+        self._tid = threading.get_ident()
+
+    def phase(self, name):
+        if not self.enabled:
+            return _NULL_PHASE
+        timer = self._timers.get(name)
+        if timer is None:
+            timer = self._timers[name] = _PhaseTimer(self, name)
+            self._totals[name] = 0
+            self._calls[name] = 0
+            self._samples[name] = np.zeros(self.max_samples, dtype=np.int64)
+        return timer
+
+    def count(self, name, n=1):
+        if self.enabled:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def _record(self, name, start, end):
+        duration = end - start
+        calls = self._calls[name]
+        self._samples[name][calls % self.max_samples] = duration
+        self._calls[name] = calls + 1
+        self._totals[name] += duration
+        if self.trace_path and len(self._trace) < self.max_trace_events:
+            self._trace.append((name, start, duration))
+
+    def summary(self):
+        """
+            Totals and p50/p99 (over the last 'max_samples' calls) of every phase, plus the counters
+            and their rates over the whole run.
+        """
+        elapsed = (time.perf_counter_ns() - self._started) / 1e9
+        phases = {}
+        for name, total in self._totals.items():
+            calls = self._calls[name]
+            samples = self._samples[name][:min(calls, self.max_samples)] / 1e6
+            phases[name] = {
+                "calls": calls,
+                "total_s": total / 1e9,
+                "share": total / 1e9 / elapsed if elapsed else 0.0,
+                "p50_ms": float(np.percentile(samples, 50)) if calls else 0.0,
+                "p99_ms": float(np.percentile(samples, 99)) if calls else 0.0,
+            }
+        rates = {f"{name}_per_sec": value / elapsed for name, value in self.counters.items()} if elapsed else {}
+        return {"elapsed_s": elapsed, "phases": phases, "counters": dict(self.counters), "rates": rates}
+
+    def report(self):
+        if not self.enabled:
+            return
+        summary = self.summary()
+        print(f"--- Profile after {summary['elapsed_s']:.1f}s ---")
+        print(f"{'phase':<20}{'calls':>10}{'total s':>10}{'share':>8}{'p50 ms':>10}{'p99 ms':>10}")
+        for name, stats in sorted(summary["phases"].items(), key=lambda item: -item[1]["total_s"]):
+            print(f"{name:<20}{stats['calls']:>10}{stats['total_s']:>10.2f}{stats['share']:>8.1%}"
+                  f"{stats['p50_ms']:>10.3f}{stats['p99_ms']:>10.3f}")
+        for name, rate in summary["rates"].items():
+            print(f"{name}: {rate:.1f}")
+
+    def write_trace(self):
+        """
+            Write the recorded phases as complete events of the Chrome trace format.
+        """
+        if not self.trace_path:
+            return
+        events = [{"name": name, "ph": "X", "ts": (start - self._started) / 1e3, "dur": duration / 1e3,
+                   "pid": self._pid, "tid": self._tid}
+                  for name, start, duration in self._trace]
+        with open(self.trace_path, "w") as f:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
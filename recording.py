@@ -0,0 +1,138 @@
+"""
+    Record games as their episode seed and action sequence (2 bits per move) and replay them exactly
+    on demand, so that training stays headless and only the games worth watching are rendered, e.g.:
+        python recording.py episodes.jsonl --list
+        python recording.py episodes.jsonl --index 3 --render
+        python recording.py episodes.jsonl --index 3 --export frames/
+    main.py --record episodes.jsonl saves the new records and the games that ended on the timeout.
+"""
+import argparse
+import base64
+import json
+import os
+from collections import namedtuple
+
+import numpy as np
+
+from snake_game_ai import SnakeGameAI
+
+Episode = namedtuple("Episode", "seed, cols, rows, steps, score, actions")
+
+
+def pack_actions(actions):
+    """
+        Action indices (0, 1 or 2) packed 4 per byte, the first one in the low bits.
+    """
+    actions = np.asarray(actions, dtype=np.uint8)
+    padded = np.zeros((len(actions) + 3) // 4 * 4, dtype=np.uint8)
+    padded[:len(actions)] = actions
+    padded = padded.reshape(-1, 4)
+    return (padded[:, 0] | padded[:, 1] << 2 | padded[:, 2] << 4 | padded[:, 3] << 6).tobytes()
+
+
+def unpack_actions(data, steps):
+    packed = np.frombuffer(data, dtype=np.uint8)
+    actions = (packed[:, np.newaxis] >> np.array([0, 2, 4, 6], dtype=np.uint8)) & 3
+    return actions.reshape(-1)[:steps]
+
+
+class EpisodeRecorder:
+    """
+        Collects the moves of the current episode of a SnakeGameAI: call 'start' after each reset,
+        'add' after each move and 'finish' at the game over to get the Episode.
+    """
+    def __init__(self):
+        self.seed = None
+        self.cols = None
+        self.rows = None
+        self.actions = bytearray()
+
+    def start(self, game):
+        self.seed = game.episode_seed
+        self.cols = game.cols
+        self.rows = game.rows
+        self.actions.clear()
+
+    def add(self, action):
+        # one byte per move while playing, packed when the episode is finished
+        self.actions.append(action)
+
+    def finish(self, score):
+        return Episode(self.seed, self.cols, self.rows, len(self.actions), score, pack_actions(self.actions))
+
+
+def save_episode(path, episode, **info):
+    """
+        Append 'episode' (and any extra 'info', e.g. the game number) to the JSONL file 'path'.
+    """
+    record = episode._asdict()
+    record["actions"] = base64.b64encode(episode.actions).decode("ascii")
+    with open(path, "a") as f:
+        f.write(json.dumps({**record, **info}) + "\n")
+
+
+def load_episodes(path):
+    episodes = []
+    with open(path) as f:
+        for line in f:
+            record = json.loads(line)
+            fields = {name: record[name] for name in Episode._fields}
+            fields["actions"] = base64.b64decode(fields["actions"])
+            episodes.append(Episode(**fields))
+    return episodes
+
+
+def replay(episode, render=False, on_frame=None):
+    """
+        Play 'episode' again from its seed and moves, on screen with 'render'.
+        'on_frame(game, step)' is called after every move that does not end the game. Returns the game at its end.
+    """
+    game = SnakeGameAI(render=render, seed=episode.seed, cols=episode.cols, rows=episode.rows)
+    actions = unpack_actions(episode.actions, episode.steps)
+    for step, action in enumerate(actions.tolist()):
+        _, game_over, score = game.play_step(action)
+        if game_over:
+            break
+        if on_frame is not None:
+            on_frame(game, step)
+    if not game_over or score != episode.score or step != episode.steps - 1:
+        raise ValueError(f"the replay diverged from the recording (score {score} instead of {episode.score})")
+    return game
+
+
+def export_frames(episode, directory):
+    """
+        Save every frame of 'episode' as a PNG image in 'directory', without opening a window.
+    """
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+    import pygame
+
+    os.makedirs(directory, exist_ok=True)
+
+    def save(game, step):
+        pygame.image.save(game.display, os.path.join(directory, f"frame_{step:06d}.png"))
+
+    replay(episode, render=True, on_frame=save)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("episodes", nargs="?", default="episodes.jsonl", help="JSONL file of recorded episodes")
+    parser.add_argument("--list", action="store_true", help="list the recorded episodes")
+    parser.add_argument("--index", type=int, default=-1, help="episode to replay (default: the last one)")
+    parser.add_argument("--render", action="store_true", help="watch the episode")
+    parser.add_argument("--export", metavar="DIR", help="save the frames of the episode as PNG images")
+    args = parser.parse_args()
+
+    episodes = load_episodes(args.episodes)
+    if args.list:
+        for i, episode in enumerate(episodes):
+            print(f"{i}: score {episode.score}, {episode.steps} moves on {episode.cols}x{episode.rows}, "
+                  f"seed {episode.seed}, {len(episode.actions)} bytes")
+    else:
+        episode = episodes[args.index]
+        if args.export:
+            export_frames(episode, args.export)
+        else:
+            game = replay(episode, render=args.render)
+            print(f"Replayed {episode.steps} moves - Score: {game.score}")
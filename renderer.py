@@ -0,0 +1,115 @@
+import pygame
+
+from snake_game_ai import BLOCK_SIZE
+
+
+class DirtyRectRenderer:
+    """
+        Draws a snake game redrawing only what changed since the previous frame: the new head,
+        the old head that became a body segment, the vacated tail cell, the old and new food
+        and the score text when it changes, pushed with pygame.display.update(rects) instead of a full flip.
+        The whole board is redrawn only on the first frame and after 'reset'.
+        The score text is drawn on an opaque background and blitted again whenever a changed cell
+        lies under it; when the score changes, the board under the old text is restored first.
+    """
+    def __init__(self, display, font, body_colors, food_color, text_color, head_colors=None,
+                 background=(0, 0, 0)):
+        self.display = display
+        self.font = font
+        self.body_colors = body_colors
+        self.head_colors = head_colors or body_colors
+        self.food_color = food_color
+        self.text_color = text_color
+        self.background = background
+
+        self._full = True
+        self._tail = None
+        self._length = 0
+        self._food = None
+        self._score = None
+        self._text = None
+        self._text_rect = None
+
+    def reset(self):
+        # new game: redraw everything at the next frame
+        self._full = True
+
+    def _cell(self, point, colors):
+        rect = pygame.Rect(point.x, point.y, BLOCK_SIZE, BLOCK_SIZE)
+        outer, inner = colors
+        pygame.draw.rect(self.display, outer, rect)
+        pygame.draw.rect(self.display, inner, pygame.Rect(point.x+4, point.y+4, 12, 12))
+        return rect
+
+    def _clear(self, point):
+        rect = pygame.Rect(point.x, point.y, BLOCK_SIZE, BLOCK_SIZE)
+        self.display.fill(self.background, rect)
+        return rect
+
+    def _draw_food(self, food):
+        rect = pygame.Rect(food.x, food.y, BLOCK_SIZE, BLOCK_SIZE)
+        pygame.draw.rect(self.display, self.food_color, rect)
+        return rect
+
+    def _render_text(self, score):
+        self._text = self.font.render("Score: " + str(score), True, self.text_color, self.background)
+
+    def _restore_under_text(self, snake, food):
+        """
+            Draw the board again under the old score text: only the cells in its top-left corner are redrawn.
+        """
+        old = self._text_rect
+        self.display.fill(self.background, old)
+        for pt in snake:
+            if pt.x < old.right and pt.y < old.bottom:
+                self._cell(pt, self.head_colors if pt is snake[0] else self.body_colors)
+        if old.colliderect(pygame.Rect(food.x, food.y, BLOCK_SIZE, BLOCK_SIZE)):
+            self._draw_food(food)
+        return old
+
+    def _redraw(self, snake, food, score):
+        self.display.fill(self.background)
+        for pt in snake:
+            self._cell(pt, self.body_colors)
+        self._cell(snake[0], self.head_colors)
+        self._draw_food(food)
+
+        self._render_text(score)
+        self._text_rect = self.display.blit(self._text, [0, 0])
+        pygame.display.flip()
+
+    def draw(self, snake, food, score):
+        """
+            Draw the frame of a game whose body is 'snake' (head first), with its 'food' and 'score'.
+        """
+        if self._full:
+            self._redraw(snake, food, score)
+            self._full = False
+        else:
+            rects = []
+            # 1. the food was eaten: its old cell is free (or the new head, drawn below)
+            if food != self._food:
+                rects.append(self._clear(self._food))
+            # 2. the snake moved without growing: its old tail cell is free
+            if len(snake) == self._length:
+                rects.append(self._clear(self._tail))
+            # 3. the old head is a body segment now, then the new head and the new food
+            if len(snake) > 1:
+                rects.append(self._cell(snake[1], self.body_colors))
+            rects.append(self._cell(snake[0], self.head_colors))
+            if food != self._food:
+                rects.append(self._draw_food(food))
+            # 4. the score text stays on top of the board
+            if score != self._score:
+                rects.append(self._restore_under_text(snake, food))
+                self._render_text(score)
+                self._text_rect = self.display.blit(self._text, [0, 0])
+                rects.append(self._text_rect)
+            elif self._text_rect.collidelist(rects) != -1:
+                rects.append(self.display.blit(self._text, [0, 0]))
+            pygame.display.update(rects)
+
+        self._tail = snake[-1]
+        self._length = len(snake)
+        self._food = food
+        self._score = score
@@ -0,0 +1,281 @@
+from collections import deque
+
+import numpy as np
+
+
+class ReplayBuffer:
+    """
+        Circular experience replay backed by preallocated contiguous arrays.
+        States are stored as uint8 (the features are 0/1), actions as int8 indices
+        (0 = straight, 1 = right turn, 2 = left turn), rewards as float32 and game overs as bool,
+        so the memory used for 'capacity' transitions is known up front (see 'nbytes').
+        With 'packed' the 0/1 states are bit-packed (8 values per byte) and unpacked when sampled,
+        which is what makes 100k full-board observations fit in memory.
+    """
+    def __init__(self, capacity, state_shape, packed=False, seed=None):
+        self.capacity = capacity
+        if isinstance(state_shape, int):
+            state_shape = (state_shape,)
+        self.state_shape = tuple(state_shape)
+        self.packed = packed
+
+        stored_shape = self.state_shape
+        if self.packed:
+            self.state_values = int(np.prod(self.state_shape))
+            stored_shape = ((self.state_values + 7) // 8,)
+        self.states = np.zeros((capacity, *stored_shape), dtype=np.uint8)
+        self.actions = np.zeros(capacity, dtype=np.int8)
+        self.rewards = np.zeros(capacity, dtype=np.float32)
+        self.next_states = np.zeros((capacity, *stored_shape), dtype=np.uint8)
+        self.game_overs = np.zeros(capacity, dtype=bool)
+
+        # next slot to write and number of stored transitions
+        self.pos = 0
+        self.size = 0
+        self.rng = np.random.default_rng(seed)
+
+    def __len__(self):
+        return self.size
+
+    @property
+    def nbytes(self):
+        return (self.states.nbytes + self.actions.nbytes + self.rewards.nbytes
+                + self.next_states.nbytes + self.game_overs.nbytes)
+
+    def push(self, state, action, reward, next_state, game_over):
+        """
+            Store one transition, overwriting the oldest one when the buffer is full.
+            'action' is the index of the action taken.
+        """
+        i = self.pos
+        self.states[i] = self._pack(state)
+        self.actions[i] = action
+        self.rewards[i] = reward
+        self.next_states[i] = self._pack(next_state)
+        self.game_overs[i] = game_over
+
+        self.pos = (self.pos + 1) % self.capacity
+        self.size = min(self.size + 1, self.capacity)
+
+    def push_batch(self, states, actions, rewards, next_states, game_overs):
+        """
+            Store a batch of transitions at once (e.g. a chunk sent by an actor or a vector of games).
+        """
+        idx = self._next_slots(len(actions))
+        self.states[idx] = self._pack(states, batch=True)
+        self.actions[idx] = actions
+        self.rewards[idx] = rewards
+        self.next_states[idx] = self._pack(next_states, batch=True)
+        self.game_overs[idx] = game_overs
+
+        self.pos = (self.pos + len(idx)) % self.capacity
+        self.size = min(self.size + len(idx), self.capacity)
+
+    def _next_slots(self, n):
+        return (self.pos + np.arange(n)) % self.capacity
+
+    def sample(self, batch_size):
+        """
+            Sample 'batch_size' transitions uniformly (all of them if there are not enough yet).
+            Returns the tensors (states, actions, rewards, next_states, game_overs)
+            built on top of the gathered arrays without further copies.
+        """
+        if self.size <= batch_size:
+            idx = np.arange(self.size)
+        else:
+            idx = self.rng.integers(0, self.size, size=batch_size)
+        return self._gather(idx)
+
+    def state_dict(self):
+        """
+            Copy of the stored transitions, e.g. to checkpoint them.
+        """
+        n = self.size
+        return {"states": self.states[:n].copy(), "actions": self.actions[:n].copy(),
+                "rewards": self.rewards[:n].copy(), "next_states": self.next_states[:n].copy(),
+                "game_overs": self.game_overs[:n].copy(), "pos": self.pos}
+
+    def load_state_dict(self, state):
+        n = len(state["actions"])
+        self.states[:n] = state["states"]
+        self.actions[:n] = state["actions"]
+        self.rewards[:n] = state["rewards"]
+        self.next_states[:n] = state["next_states"]
+        self.game_overs[:n] = state["game_overs"]
+        self.size = n
+        self.pos = state["pos"] % self.capacity
+
+    def _pack(self, states, batch=False):
+        if not self.packed:
+            return states
+        states = np.asarray(states, dtype=np.uint8)
+        if batch:
+            return np.packbits(states.reshape(len(states), -1), axis=1)
+        return np.packbits(states.reshape(-1))
+
+    def _unpack(self, states):
+        if not self.packed:
+            return states
+        return np.unpackbits(states, axis=1, count=self.state_values).reshape(len(states), *self.state_shape)
+
+    def _gather(self, idx):
+        # torch is only needed by the training side, which has imported it already
+        import torch
+
+        return (torch.from_numpy(self._unpack(self.states[idx])),
+                torch.from_numpy(self.actions[idx]),
+                torch.from_numpy(self.rewards[idx]),
+                torch.from_numpy(self._unpack(self.next_states[idx])),
+                torch.from_numpy(self.game_overs[idx]))
+
+
+class SumTree:
+    """
+        Binary tree where every node holds the sum of its children and the leaves hold the priorities.
+        Stored in a flat array: the root is at index 1, the children of node i are 2i and 2i+1
+        and the leaf of slot j is at 'size + j'. Updates and prefix-sum searches are O(log n).
+    """
+    def __init__(self, capacity):
+        self.size = 1
+        while self.size < capacity:
+            self.size *= 2
+        self.tree = np.zeros(2 * self.size, dtype=np.float64)
+
+    def total(self):
+        return self.tree[1]
+
+    def get(self, idx):
+        return self.tree[np.asarray(idx) + self.size]
+
+    def update(self, idx, priorities):
+        """
+            Set the priorities of the slots in 'idx' (a single slot or an array of slots).
+        """
+        if np.ndim(idx) == 0:
+            node = int(idx) + self.size
+            self.tree[node] = priorities
+            node //= 2
+            while node >= 1:
+                self.tree[node] = self.tree[2 * node] + self.tree[2 * node + 1]
+                node //= 2
+            return
+
+        nodes = np.asarray(idx, dtype=np.int64) + self.size
+        self.tree[nodes] = priorities
+        # all the leaves are at the same depth: fix one level of parents at a time
+        nodes = np.unique(nodes // 2)
+        while nodes[0] >= 1:
+            self.tree[nodes] = self.tree[2 * nodes] + self.tree[2 * nodes + 1]
+            nodes = np.unique(nodes // 2)
+            if nodes[-1] == 0:
+                break
+
+    def find(self, values):
+        """
+            For every value in [0, total) return the slot whose cumulative priority range contains it.
+        """
+        values = np.array(values, dtype=np.float64)
+        nodes = np.ones(len(values), dtype=np.int64)
+        while nodes[0] < self.size:
+            left = 2 * nodes
+            go_right = values > self.tree[left]
+            values -= self.tree[left] * go_right
+            nodes = left + go_right
+        return nodes - self.size
+
+
+class PrioritizedReplayBuffer(ReplayBuffer):
+    """
+        Replay buffer sampling transitions with probability proportional to priority^alpha,
+        where the priority is the last absolute TD error of the transition (plus 'eps').
+        New transitions get the highest priority seen so far, so that they are replayed at least once.
+        Samples come with importance-sampling weights (N * P(i))^-beta normalized by their maximum.
+    """
+    def __init__(self, capacity, state_shape, alpha=0.6, eps=1e-5, packed=False, seed=None):
+        super().__init__(capacity, state_shape, packed=packed, seed=seed)
+        self.alpha = alpha
+        self.eps = eps
+        self.tree = SumTree(capacity)
+        self.max_priority = 1.0
+
+    def push(self, state, action, reward, next_state, game_over):
+        self.tree.update(self.pos, self.max_priority)
+        super().push(state, action, reward, next_state, game_over)
+
+    def push_batch(self, states, actions, rewards, next_states, game_overs):
+        self.tree.update(self._next_slots(len(actions)), self.max_priority)
+        super().push_batch(states, actions, rewards, next_states, game_overs)
+
+    def state_dict(self):
+        state = super().state_dict()
+        state["priorities"] = self.tree.get(np.arange(self.size))
+        state["max_priority"] = self.max_priority
+        return state
+
+    def load_state_dict(self, state):
+        super().load_state_dict(state)
+        if self.size:
+            self.tree.update(np.arange(self.size), state["priorities"])
+        self.max_priority = state["max_priority"]
+
+    def sample(self, batch_size, beta=0.4):
+        """
+            Sample 'batch_size' transitions by priority (all of them if there are not enough yet).
+            Returns the tensors (states, actions, rewards, next_states, game_overs, weights)
+            and the sampled slots, to be passed back to 'update_priorities'.
+        """
+        total = self.tree.total()
+        if self.size <= batch_size:
+            idx = np.arange(self.size)
+        else:
+            # stratified sampling: one value in each of 'batch_size' equal segments of the total
+            segment = total / batch_size
+            values = (np.arange(batch_size) + self.rng.random(batch_size)) * segment
+            idx = np.minimum(self.tree.find(values), self.size - 1)
+
+        probs = self.tree.get(idx) / total
+        weights = (self.size * probs) ** -beta
+        weights /= weights.max()
+        import torch
+
+        return (*self._gather(idx), torch.from_numpy(weights.astype(np.float32))), idx
+
+    def update_priorities(self, idx, td_errors):
+        priorities = (np.abs(td_errors) + self.eps) ** self.alpha
+        self.tree.update(idx, priorities)
+        self.max_priority = max(self.max_priority, float(priorities.max()))
+
+
+class NStepAccumulator:
+    """
+        Turns consecutive 1-step transitions of a game into n-step ones:
+        (s_t, a_t, r_t + gamma r_t+1 + ... + gamma^(n-1) r_t+n-1, s_t+n, game_over).
+        At the end of a game the pending transitions are flushed with the rewards left,
+        they are terminal so they need no bootstrap.
+    """
+    def __init__(self, n, gamma):
+        self.n = n
+        self.gamma = gamma
+        self.pending = deque()
+
+    def add(self, state, action, reward, next_state, game_over):
+        """
+            Add a transition and return the list of n-step transitions completed by it.
+        """
+        self.pending.append((state, action, reward, next_state, game_over))
+        completed = []
+        if game_over:
+            while self.pending:
+                completed.append(self._pop())
+        elif len(self.pending) == self.n:
+            completed.append(self._pop())
+        return completed
+
+    def _pop(self):
+        state, action = self.pending[0][:2]
+        ret = 0.0
+        for k, transition in enumerate(self.pending):
+            ret += self.gamma ** k * transition[2]
+        next_state, game_over = self.pending[-1][3:]
+        self.pending.popleft()
+        return state, action, ret, next_state, game_over
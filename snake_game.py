@@ -3,8 +3,10 @@ import random
 from enum import Enum
 from collections import namedtuple
 
-pygame.init()
-font = pygame.font.Font('arial.ttf', 25)
+from renderer import DirtyRectRenderer
+
+# Loaded when the first game opens its window, not at import
+font = None
 #font = pygame.font.SysFont('arial', 25)
 
 class Direction(Enum):
@@ -28,12 +30,17 @@ SPEED = 20
 class SnakeGame:
     
     def __init__(self, w=640, h=480):
+        global font
         self.w = w
         self.h = h
         # init display
+        pygame.init()
+        if font is None:
+            font = pygame.font.Font('arial.ttf', 25)
         self.display = pygame.display.set_mode((self.w, self.h))
         pygame.display.set_caption('Snake')
         self.clock = pygame.time.Clock()
+        self.renderer = DirtyRectRenderer(self.display, font, (BLUE1, BLUE2), RED, WHITE)
         
         # init game state
         self.direction = Direction.RIGHT
@@ -104,17 +111,8 @@ class SnakeGame:
         return False
         
     def _update_ui(self):
-        self.display.fill(BLACK)
-        
-        for pt in self.snake:
-            pygame.draw.rect(self.display, BLUE1, pygame.Rect(pt.x, pt.y, BLOCK_SIZE, BLOCK_SIZE))
-            pygame.draw.rect(self.display, BLUE2, pygame.Rect(pt.x+4, pt.y+4, 12, 12))
-            
-        pygame.draw.rect(self.display, RED, pygame.Rect(self.food.x, self.food.y, BLOCK_SIZE, BLOCK_SIZE))
-        
-        text = font.render("Score: " + str(self.score), True, WHITE)
-        self.display.blit(text, [0, 0])
-        pygame.display.flip()
+        # only the cells that changed since the last frame are redrawn
+        self.renderer.draw(self.snake, self.food, self.score)
         
     def _move(self, direction):
         x = self.head.x
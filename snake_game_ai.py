@@ -3,10 +3,11 @@ from collections import namedtuple, deque
 from enum import Enum
 
 import numpy as np
-import pygame
 
-pygame.init()
-font = pygame.font.Font('arial.ttf', 25)
+# pygame is imported, and the font loaded, only by games that render:
+# headless games and the modules importing this one never pay for it
+font = None
+
 class Direction(Enum):
     RIGHT = 1
     LEFT = 2
@@ -15,6 +16,17 @@ class Direction(Enum):
     
 Point = namedtuple('Point', 'x, y')
 
+# State of a SnakeGameAI saved by 'snapshot', in immutable containers: it can be restored any number of times
+GameSnapshot = namedtuple('GameSnapshot', 'snake, direction, food, score, frame_iteration, grid, free, free_pos, '
+                                          'cycle, visits, repeated, cycles_detected, episode_seed, rng')
+
+# Moves in the clockwise order of the directions (RIGHT, DOWN, LEFT, UP), in cells,
+# and direction index change of each action (straight, right turn, left turn)
+DX = np.array([1, 0, -1, 0], dtype=np.int32)
+DY = np.array([0, 1, 0, -1], dtype=np.int32)
+TURNS = np.array([0, 1, -1], dtype=np.int32)
+_TURNS = [int(t) for t in TURNS]
+
 # rgb colors
 WHITE = (255, 255, 255)
 RED = (200,0,0)
@@ -26,65 +38,208 @@ GREEN = (0, 153, 0)
 BLOCK_SIZE = 20
 SPEED = 60
 
+# Cycle penalty: a position visited CYCLE_REPEATS times in the last CYCLE_WINDOW heads
+CYCLE_WINDOW = 20
+CYCLE_REPEATS = 5
+
 class SnakeGameAI:
     """
         This is an agent controlled game.
+        By default it runs headless: no display, no clock throttle and no event pump.
+        Pass 'render=True' to watch it.
+        Every episode places the food with its own random generator, seeded with 'episode_seed':
+        the game is fully determined by that seed and the actions (see recording.py).
+        The first episode is seeded with 'seed', the next ones with seeds drawn from it
+        (from the OS entropy if 'seed' is None).
+        A move is penalized as a cycle when the new head was already visited 'cycle_repeats' times
+        in the last 'cycle_window' moves; 'cycles_detected' counts these penalties.
+        The board is 'w' x 'h' pixels, or 'cols' x 'rows' cells when they are given.
     """
-    def __init__(self, w=640, h=480):
-        self.w = w
-        self.h = h
+    def __init__(self, w=640, h=480, render=False, seed=None, cycle_window=CYCLE_WINDOW, cycle_repeats=CYCLE_REPEATS,
+                 cols=None, rows=None):
+        # board size in cells
+        self.cols = cols if cols is not None else w // BLOCK_SIZE
+        self.rows = rows if rows is not None else h // BLOCK_SIZE
+        self.w = self.cols * BLOCK_SIZE if cols is not None else w
+        self.h = self.rows * BLOCK_SIZE if rows is not None else h
+        self.render = render
+        # draws the seeds of the episodes after the first one
+        self._seeds = random.Random(seed)
 
-        # init display
-        self.display = pygame.display.set_mode((self.w, self.h))
-        pygame.display.set_caption('Snake')
-        self.clock = pygame.time.Clock()
-        self.cycle = deque(maxlen=20)
+        # init display only if we want to watch the game
+        self.display = None
+        self.clock = None
+        self.renderer = None
+        if self.render:
+            self._init_display()
+        # last heads and how many times each of them appears there, updated as heads enter and leave
+        self.cycle_window = cycle_window
+        self.cycle_repeats = cycle_repeats
+        self.cycle = deque()
+        self._visits = {}
+        # number of positions of the window visited at least 'cycle_repeats' times
+        self._repeated = 0
+        self.cycles_detected = 0
         self.frame_iteration = 0
-        self.reset()
+        self.reset(seed)
         
 
-    def reset(self):
+    def reset(self, seed=None):
         """
-            Init or reset the game state.
+            Init or reset the game state. The new episode is seeded with 'seed' if given.
         """
+        if seed is None:
+            seed = self._seeds.getrandbits(63)
+        self.episode_seed = seed
+        self.rng = random.Random(seed)
+
         # init game state
         self.direction = Direction.RIGHT
         
-        self.head = Point(self.w/2, self.h/2)
-        self.snake = [self.head, 
-                      Point(self.head.x-BLOCK_SIZE, self.head.y),
-                      Point(self.head.x-(2*BLOCK_SIZE), self.head.y)]
-        
+        # start from the center cell, so that boards with an odd number of cells stay aligned
+        self.head = Point((self.cols // 2) * BLOCK_SIZE, (self.rows // 2) * BLOCK_SIZE)
+        self.snake = deque([self.head,
+                            Point(self.head.x-BLOCK_SIZE, self.head.y),
+                            Point(self.head.x-(2*BLOCK_SIZE), self.head.y)])
+
+        # occupancy of the board: how many body segments lie on each cell.
+        # The free cells are kept in a list (with the position of each cell in it) so that
+        # they can be added, removed and sampled in O(1).
+        n_cells = self.cols * self.rows
+        self.grid = bytearray(n_cells)
+        self._free = list(range(n_cells))
+        self._free_pos = list(range(n_cells))
+        for pt in self.snake:
+            self._occupy(self._cell(pt))
+
+        self._clear_cycle()
+        if self.renderer is not None:
+            self.renderer.reset()
+
         self.score = 0
         self.food = None
         self._place_food()
         # keep track of frame iteration
         self.frame_iteration = 0
+
+    def snapshot(self):
+        """
+            Save the state of the game: the body, the occupancy grid, the free cells, the cycle window
+            and the state of the food generator, copied into tuples and bytes. The Points are immutable
+            and shared, and the display is left out: a snapshot costs a few flat copies.
+            'restore' goes back to it, e.g. to try moves ahead and undo them.
+        """
+        return GameSnapshot(tuple(self.snake), self.direction, self.food, self.score, self.frame_iteration,
+                            bytes(self.grid), tuple(self._free), tuple(self._free_pos),
+                            tuple(self.cycle), tuple(self._visits.items()), self._repeated, self.cycles_detected,
+                            self.episode_seed, self.rng.getstate())
+
+    def restore(self, snapshot):
+        """
+            Go back to the state saved by 'snapshot'. The snapshot is left untouched and can be restored again.
+        """
+        self.snake = deque(snapshot.snake)
+        self.head = self.snake[0]
+        self.direction = snapshot.direction
+        self.food = snapshot.food
+        self.score = snapshot.score
+        self.frame_iteration = snapshot.frame_iteration
+        self.grid = bytearray(snapshot.grid)
+        self._free = list(snapshot.free)
+        self._free_pos = list(snapshot.free_pos)
+        self.cycle = deque(snapshot.cycle)
+        self._visits = dict(snapshot.visits)
+        self._repeated = snapshot.repeated
+        self.cycles_detected = snapshot.cycles_detected
+        self.episode_seed = snapshot.episode_seed
+        self.rng.setstate(snapshot.rng)
+        if self.renderer is not None:
+            self.renderer.reset()
+
+    def _init_display(self):
+        global font
+        import pygame
+
+        pygame.init()
+        if font is None:
+            font = pygame.font.Font('arial.ttf', 25)
+        self.display = pygame.display.set_mode((self.w, self.h))
+        pygame.display.set_caption('Snake')
+        self.clock = pygame.time.Clock()
+
+        from renderer import DirtyRectRenderer
+
+        self.renderer = DirtyRectRenderer(self.display, font, (BLUE1, BLUE2), RED, WHITE, head_colors=(GREEN, GREEN))
         
+    def _cell(self, point):
+        return (int(point.y) // BLOCK_SIZE) * self.cols + int(point.x) // BLOCK_SIZE
+
+    def _occupy(self, cell):
+        self.grid[cell] += 1
+        if self.grid[cell] == 1:
+            # swap the cell with the last free one and drop it
+            pos = self._free_pos[cell]
+            last = self._free.pop()
+            if last != cell:
+                self._free[pos] = last
+                self._free_pos[last] = pos
+
+    def _vacate(self, cell):
+        self.grid[cell] -= 1
+        if self.grid[cell] == 0:
+            self._free_pos[cell] = len(self._free)
+            self._free.append(cell)
+
     def _place_food(self):
-        x = random.randint(0, (self.w-BLOCK_SIZE )//BLOCK_SIZE )*BLOCK_SIZE 
-        y = random.randint(0, (self.h-BLOCK_SIZE )//BLOCK_SIZE )*BLOCK_SIZE
-        self.food = Point(x, y)
-        if self.food in self.snake:
-            self._place_food()
+        # a full board has nowhere to put the food: the next move ends the game anyway
+        if not self._free:
+            return
+        # a few uniform draws over the whole board first: with the same seed, games played by
+        # different agents see the same candidate cells. Crowded boards sample the free cells directly.
+        n_cells = len(self.grid)
+        for _ in range(8):
+            cell = self.rng.randrange(n_cells)
+            if self.grid[cell] == 0:
+                break
+        else:
+            cell = self.rng.choice(self._free)
+        y, x = divmod(cell, self.cols)
+        self.food = Point(x*BLOCK_SIZE, y*BLOCK_SIZE)
         
     def distance_from_food(self):
         dist = ((self.head.x - self.food.x)**2 + (self.head.y - self.food.y)**2)**(0.5)
         return dist
     
-    def check_for_cycles(self):
-        moves = dict()
-        for move in self.cycle:
-            if moves.get(move):
-                moves[move] += 1
+    def _push_cycle(self, point):
+        """
+            Append a head to the cycle window, forgetting the oldest one when the window is full.
+        """
+        visits = self._visits
+        if len(self.cycle) == self.cycle_window:
+            old = self.cycle.popleft()
+            count = visits[old]
+            if count == self.cycle_repeats:
+                self._repeated -= 1
+            if count == 1:
+                del visits[old]
             else:
-                moves[move] = 1
-        
-        for v in moves.values():
-            if v >= 5:
-                print("cycle detected")
-                self.cycle.clear()
-                return True
+                visits[old] = count - 1
+        self.cycle.append(point)
+        count = visits.get(point, 0) + 1
+        visits[point] = count
+        if count == self.cycle_repeats:
+            self._repeated += 1
+
+    def _clear_cycle(self):
+        self.cycle.clear()
+        self._visits.clear()
+        self._repeated = 0
+
+    def check_for_cycles(self):
+        if self._repeated > 0:
+            self.cycles_detected += 1
+            self._clear_cycle()
+            return True
         return False
     
     def play_step(self, action):
@@ -93,17 +248,22 @@ class SnakeGameAI:
 
         initial_distance = self.distance_from_food()
         # 1. collect user input only to check if we want to stop the game
-        for event in pygame.event.get():
-            if event.type == pygame.QUIT:
-                pygame.quit()
-                quit()
+        if self.render:
+            import pygame
+
+            for event in pygame.event.get():
+                if event.type == pygame.QUIT:
+                    pygame.quit()
+                    quit()
 
         # 2. move: update the head of the snake
         self._move(action)
-        self.snake.insert(0, self.head)
+        self.snake.appendleft(self.head)
+        if 0 <= self.head.x < self.cols*BLOCK_SIZE and 0 <= self.head.y < self.rows*BLOCK_SIZE:
+            self._occupy(self._cell(self.head))
         final_distance = self.distance_from_food()
 
-        self.cycle.append(self.head)
+        self._push_cycle(self.head)
 
         # 3. check if game over
         # set reward to return to the agent
@@ -121,7 +281,7 @@ class SnakeGameAI:
             reward = 10
             self._place_food()
         else:
-            self.snake.pop()
+            self._vacate(self._cell(self.snake.pop()))
 
             if final_distance < initial_distance:
                 reward = 0.1
@@ -131,9 +291,10 @@ class SnakeGameAI:
             if self.check_for_cycles():
                 reward = -1
         
-        # 5. update ui and clock
-        self._update_ui()
-        self.clock.tick(SPEED)
+        # 5. update ui and clock (only when watching)
+        if self.render:
+            self._update_ui()
+            self.clock.tick(SPEED)
         # 6. return game over and score
         return reward, game_over, self.score
     
@@ -149,32 +310,26 @@ class SnakeGameAI:
         # hits boundary
         if point.x > self.w - BLOCK_SIZE or point.x < 0 or point.y > self.h - BLOCK_SIZE or point.y < 0:
             return True
-        # hits itself
-        if point in self.snake[1:]:
+        # hits itself: the head cell counts only if another segment lies on it
+        hits = self.grid[self._cell(point)]
+        if point == self.snake[0]:
+            hits -= 1
+        if hits > 0:
             return True
         
         return False
         
     def _update_ui(self):
-        self.display.fill(BLACK)
-        
-        pt = self.head
-        pygame.draw.rect(self.display, GREEN, pygame.Rect(pt.x, pt.y, BLOCK_SIZE, BLOCK_SIZE))
-        pygame.draw.rect(self.display, GREEN, pygame.Rect(pt.x+4, pt.y+4, 12, 12))
-            
-        for pt in self.snake[1:]:
-            pygame.draw.rect(self.display, BLUE1, pygame.Rect(pt.x, pt.y, BLOCK_SIZE, BLOCK_SIZE))
-            pygame.draw.rect(self.display, BLUE2, pygame.Rect(pt.x+4, pt.y+4, 12, 12))
-            
-        pygame.draw.rect(self.display, RED, pygame.Rect(self.food.x, self.food.y, BLOCK_SIZE, BLOCK_SIZE))
-        
-        text = font.render("Score: " + str(self.score), True, WHITE)
-        self.display.blit(text, [0, 0])
-        pygame.display.flip()
+        # only the cells that changed since the last frame are redrawn
+        self.renderer.draw(self.snake, self.food, self.score)
         
     def _move(self, action):
         """
-            Action is a list of the form: [0/1, 0/1, 0/1]:
+            Action is the index of the move (as returned by Agent.get_action):
+            - 0 = go straight
+            - 1 = right turn
+            - 2 = left turn
+            or a list of the form: [0/1, 0/1, 0/1]:
             - [1, 0, 0] = go straight
             - [0, 1, 0] = right turn
             - [0, 0, 1] = left turn
@@ -183,7 +338,9 @@ class SnakeGameAI:
         clock_wise = [Direction.RIGHT, Direction.DOWN, Direction.LEFT, Direction.UP]
         direction_index = clock_wise.index(self.direction)
         
-        if np.array_equal(action, [1, 0, 0]):
+        if isinstance(action, (int, np.integer)):
+            new_direction = clock_wise[(direction_index + _TURNS[action]) % 4]
+        elif np.array_equal(action, [1, 0, 0]):
             new_direction = clock_wise[direction_index]
         elif np.array_equal(action, [0, 1, 0]):
             next_direction_index = (direction_index + 1) % 4 # mod 4 used for start again from 0 after 3
@@ -0,0 +1,183 @@
+import numpy as np
+
+from snake_game_ai import BLOCK_SIZE, DX, DY, TURNS, Direction
+
+# Index of each direction in the clockwise order used by the games: RIGHT, DOWN, LEFT, UP
+DIRECTION_INDEX = {Direction.RIGHT: 0, Direction.DOWN: 1, Direction.LEFT: 2, Direction.UP: 3}
+# Move direction features (left, right, up, down) of each clockwise direction index
+DIRECTION_ONE_HOT = np.array([[0, 1, 0, 0],
+                              [0, 0, 0, 1],
+                              [1, 0, 0, 0],
+                              [0, 0, 1, 0]], dtype=int)
+_DIRECTION_SLOT = [3 + int(np.argmax(row)) for row in DIRECTION_ONE_HOT]
+# plain Python copies for the single game path, cheaper than indexing NumPy arrays with scalars
+_DX = [int(v) for v in DX]
+_DY = [int(v) for v in DY]
+_TURNS = [int(v) for v in TURNS]
+
+STATE_SIZE = 11
+
+
+def encode_state(game, out=None):
+    """
+        Compute the 11 state features of a SnakeGameAI into 'out' (a new array if None):
+        - danger straight, right and left: the next cell in that direction is a wall or a body segment
+        - move direction (left, right, up, down), one-hot
+        - food location (left, right, up, down) with respect to the head
+        The dangers are read from the occupancy grid of the game.
+    """
+    if out is None:
+        out = np.zeros(STATE_SIZE, dtype=int)
+
+    cols = game.cols
+    rows = game.rows
+    grid = game.grid
+    head = game.head
+    hx = int(head.x) // BLOCK_SIZE
+    hy = int(head.y) // BLOCK_SIZE
+    d = DIRECTION_INDEX[game.direction]
+
+    # Danger straight, right, left
+    for k in range(3):
+        nd = (d + _TURNS[k]) % 4
+        x = hx + _DX[nd]
+        y = hy + _DY[nd]
+        out[k] = not (0 <= x < cols and 0 <= y < rows) or grid[y * cols + x] > 0
+
+    # Move direction
+    out[3:7] = 0
+    out[_DIRECTION_SLOT[d]] = 1
+
+    # Food location
+    food = game.food
+    out[7] = food.x < head.x # food left
+    out[8] = food.x > head.x # food right
+    out[9] = food.y < head.y # food up
+    out[10] = food.y > head.y # food down
+    return out
+
+
+def encode_states(grid, head, direction, food, out=None, cols=None, rows=None):
+    """
+        Batched version of 'encode_state' for N games given as arrays (e.g. the ones of VectorSnakeEnv):
+        grid (N, rows, cols) occupancy, head and food (N, 2) cell coordinates and
+        direction (N,) clockwise direction indices. Writes the (N, 11) features into 'out'.
+        'cols' and 'rows' are the (N,) board sizes of games smaller than the grid (the whole grid if None).
+    """
+    n, height, width = grid.shape
+    cols = width if cols is None else cols
+    rows = height if rows is None else rows
+    if out is None:
+        out = np.zeros((n, STATE_SIZE), dtype=int)
+
+    flat = grid.reshape(n, -1)
+    games = np.arange(n)
+    hx = head[:, 0]
+    hy = head[:, 1]
+
+    # Danger straight, right, left
+    for k in range(3):
+        nd = (direction + TURNS[k]) % 4
+        x = hx + DX[nd]
+        y = hy + DY[nd]
+        inside = (x >= 0) & (x < cols) & (y >= 0) & (y < rows)
+        cells = np.where(inside, y * width + x, 0)
+        out[:, k] = ~inside | flat[games, cells]
+
+    # Move direction
+    out[:, 3:7] = DIRECTION_ONE_HOT[direction]
+
+    # Food location
+    out[:, 7] = food[:, 0] < hx
+    out[:, 8] = food[:, 0] > hx
+    out[:, 9] = food[:, 1] < hy
+    out[:, 10] = food[:, 1] > hy
+    return out
+
+
+# Channels of the full-board observation
+BODY, HEAD, FOOD, HEADING = range(4)
+GRID_CHANNELS = 4
+
+
+class GridEncoder:
+    """
+        Full-board observation of a SnakeGameAI: a (GRID_CHANNELS, rows, cols) uint8 grid with
+        the body (head included), the head, the food and the heading (the cell in front of the head).
+        The grid is updated from the previous frame by touching only the cells that changed
+        (old/new head, vacated tail, old/new food, old/new heading); it is rebuilt from scratch
+        only after a reset or when frames were skipped.
+    """
+    def __init__(self, game):
+        self.game = game
+        self.grid = np.zeros((GRID_CHANNELS, game.rows, game.cols), dtype=np.uint8)
+        self._frame = -1
+        # SnakeGameAI.reset builds a new occupancy grid: seeing another one means a new game
+        self._game_grid = None
+        # cells drawn at the last frame, None when outside the board
+        self._head = None
+        self._tail = None
+        self._food = None
+        self._heading = None
+
+    def _cell(self, x, y):
+        if 0 <= x < self.game.cols and 0 <= y < self.game.rows:
+            return y, x
+        return None
+
+    def _cells(self):
+        game = self.game
+        hx = int(game.head.x) // BLOCK_SIZE
+        hy = int(game.head.y) // BLOCK_SIZE
+        d = DIRECTION_INDEX[game.direction]
+        tail = game.snake[-1]
+        return (self._cell(hx, hy),
+                self._cell(int(tail.x) // BLOCK_SIZE, int(tail.y) // BLOCK_SIZE),
+                self._cell(int(game.food.x) // BLOCK_SIZE, int(game.food.y) // BLOCK_SIZE),
+                self._cell(hx + _DX[d], hy + _DY[d]))
+
+    def _rebuild(self):
+        game = self.game
+        self.grid[:] = 0
+        self.grid[BODY] = np.frombuffer(game.grid, dtype=np.uint8).reshape(game.rows, game.cols) > 0
+        self._head, self._tail, self._food, self._heading = self._cells()
+        for channel, cell in ((HEAD, self._head), (FOOD, self._food), (HEADING, self._heading)):
+            if cell is not None:
+                self.grid[(channel, *cell)] = 1
+
+    def _update(self):
+        game = self.game
+        grid = self.grid
+        head, tail, food, heading = self._cells()
+
+        # body: the new head comes in, the old tail may have left
+        for cell in (head, self._tail):
+            if cell is not None:
+                y, x = cell
+                grid[BODY, y, x] = game.grid[y * game.cols + x] > 0
+        for channel, old, new in ((HEAD, self._head, head), (FOOD, self._food, food),
+                                  (HEADING, self._heading, heading)):
+            if old != new:
+                if old is not None:
+                    grid[(channel, *old)] = 0
+                if new is not None:
+                    grid[(channel, *new)] = 1
+
+        self._head, self._tail, self._food, self._heading = head, tail, food, heading
+
+    def encode(self, out=None):
+        """
+            Bring the grid up to date with the game and copy it into 'out' (a new array if None).
+        """
+        frame = self.game.frame_iteration
+        if self.game.grid is not self._game_grid or frame not in (self._frame, self._frame + 1):
+            self._rebuild()
+            self._game_grid = self.game.grid
+        elif frame == self._frame + 1:
+            self._update()
+        self._frame = frame
+
+        if out is None:
+            return self.grid.copy()
+        out[:] = self.grid
+        return out
@@ -0,0 +1,174 @@
+"""
+    Hyperparameter sweep: headless training trials (main.train_batched) run concurrently across processes,
+    underperforming trials are stopped early and the results are written as a CSV table, e.g.:
+        python sweep.py --param lr=0.001,0.0005,0.0002 --param gamma=0.9,0.95 --games 2000 --workers 4
+    The parameters are the fields of config.TrainConfig. Every trial runs in its own directory
+    (with its metrics log and best model) under --dir.
+"""
+import argparse
+import contextlib
+import csv
+import dataclasses
+import io
+import itertools
+import multiprocessing
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+
+from config import TrainConfig
+
+# Env steps between two reports of a trial to the pruner: every trial does the same work per env step,
+# so trials running side by side reach the reports together, whatever the length of their games
+REPORT_EVERY = 20_000
+
+
+class MedianPruner:
+    """
+        Median stopping rule: every REPORT_EVERY env steps a trial reports its rolling mean score and stops
+        if it is below the median of what the other trials reported after the same number of steps.
+        Trials are never stopped during their first 'grace_steps' env steps, nor before 'min_trials'
+        other trials reached the same point. The reports are shared through a multiprocessing Manager.
+    """
+    def __init__(self, manager, grace_steps=100_000, min_trials=3):
+        self.grace_steps = grace_steps
+        self.min_trials = min_trials
+        # (trial, env steps) -> rolling mean score
+        self.reports = manager.dict()
+
+    def report(self, trial, steps, value):
+        """
+            Record the rolling mean 'value' of 'trial' after 'steps' env steps. Returns True if the trial should stop.
+        """
+        self.reports[(trial, steps)] = value
+        if steps < self.grace_steps:
+            return False
+        others = [v for (t, s), v in self.reports.items() if s == steps and t != trial]
+        if len(others) < self.min_trials:
+            return False
+        return value < np.median(others)
+
+
+def parse_param(text):
+    """
+        'name=v1,v2,...' into the TrainConfig field name and its values, converted to the type of the field.
+    """
+    name, _, values = text.partition("=")
+    name = name.strip().replace("-", "_")
+    fields = {field.name: field for field in dataclasses.fields(TrainConfig)}
+    if name not in fields or not values:
+        raise argparse.ArgumentTypeError(f"expected name=v1,v2,... with name in {', '.join(fields)}")
+    return name, [fields[name].type(v) for v in values.split(",")]
+
+
+def trial_grid(params, n_trials=None, seed=0):
+    """
+        Every combination of the values of 'params' (a list of (name, values)), or 'n_trials' of them at random.
+    """
+    names = [name for name, _ in params]
+    trials = [dict(zip(names, values)) for values in itertools.product(*(values for _, values in params))]
+    if n_trials is not None and n_trials < len(trials):
+        trials = random.Random(seed).sample(trials, n_trials)
+    return trials
+
+
+def _run_trial(trial, params, games, n_games, curriculum, seed, pruner, directory):
+    """
+        Train with the hyperparameters 'params' in 'directory' and report to 'pruner' along the way.
+        Returns the row of the trial in the results table.
+    """
+    import torch
+
+    import main
+
+    # one thread per trial, the parallelism comes from the processes
+    torch.set_num_threads(1)
+    os.makedirs(directory, exist_ok=True)
+    os.chdir(directory)
+
+    progress = {"pruned": False, "summary": {}, "env_steps": 0, "reports": 0}
+
+    def callback(agent, metrics, env_steps):
+        progress["summary"] = metrics.summary()
+        progress["env_steps"] = env_steps
+        reports = env_steps // REPORT_EVERY
+        if reports == progress["reports"]:
+            return False
+        progress["reports"] = reports
+        progress["pruned"] = pruner.report(trial, reports * REPORT_EVERY, metrics.rolling_mean)
+        return progress["pruned"]
+
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        main.train_batched(n_games=n_games, curriculum=curriculum, max_games=games, seed=seed,
+                           metrics_path="metrics.jsonl", config=TrainConfig().replace(**params),
+                           callback=callback)
+    summary = progress["summary"]
+    return {"trial": trial, **params, "status": "pruned" if progress["pruned"] else "complete",
+            "games": summary.get("game", 0), "env_steps": progress["env_steps"],
+            "rolling_mean": summary.get("rolling_mean", 0.0), "mean": summary.get("mean", 0.0),
+            "record": summary.get("record", 0), "seconds": time.perf_counter() - start}
+
+
+def sweep(params, games=2000, n_trials=None, workers=None, n_games=64, curriculum=False, seed=0,
+          grace_steps=100_000, directory="sweeps"):
+    """
+        Run the trials of 'params' (see trial_grid) on 'workers' processes, 'games' games each at most,
+        and return their results sorted from the best final rolling mean score.
+    """
+    trials = trial_grid(params, n_trials, seed)
+    workers = workers or os.cpu_count()
+    directory = os.path.abspath(directory)
+    results = []
+    with multiprocessing.Manager() as manager:
+        pruner = MedianPruner(manager, grace_steps)
+        with ProcessPoolExecutor(max_workers=min(workers, len(trials))) as pool:
+            futures = [pool.submit(_run_trial, i, trial, games, n_games, curriculum, seed, pruner,
+                                   os.path.join(directory, f"trial_{i:03d}"))
+                       for i, trial in enumerate(trials)]
+            for future in as_completed(futures):
+                result = future.result()
+                results.append(result)
+                print(f"--- Trial {result['trial']} {result['status']} after {result['games']} games "
+                      f"- Mean: {result['rolling_mean']:.2f} ---")
+    return sorted(results, key=lambda r: -r["rolling_mean"])
+
+
+def write_results(results, path):
+    with open(path, "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=list(results[0]))
+        writer.writeheader()
+        writer.writerows(results)
+
+
+def print_results(results):
+    columns = list(results[0])
+    cells = [[f"{r[c]:.4g}" if isinstance(r[c], float) else str(r[c]) for c in columns] for r in results]
+    widths = [max(len(c), *(len(row[i]) for row in cells)) for i, c in enumerate(columns)]
+    print("  ".join(c.rjust(w) for c, w in zip(columns, widths)))
+    for row in cells:
+        print("  ".join(v.rjust(w) for v, w in zip(row, widths)))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--param", type=parse_param, action="append", required=True,
+                        help="hyperparameter and its values, e.g. lr=0.001,0.0005 (repeat for several)")
+    parser.add_argument("--trials", type=int, help="run this many random combinations instead of all of them")
+    parser.add_argument("--games", type=int, default=2000, help="games of a trial that is not stopped early")
+    parser.add_argument("--batch", type=int, default=64, help="games stepped together in every trial")
+    parser.add_argument("--curriculum", action="store_true", help="train the trials with the board curriculum")
+    parser.add_argument("--workers", type=int, help="number of processes (default: one per core)")
+    parser.add_argument("--grace", type=int, default=100_000, help="env steps before a trial can be stopped")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--dir", default="sweeps", help="directory of the trials")
+    parser.add_argument("--out", default="sweep_results.csv", help="CSV table of the results")
+    args = parser.parse_args()
+
+    results = sweep(args.param, args.games, args.trials, args.workers, args.batch, args.curriculum,
+                    args.seed, args.grace, args.dir)
+    write_results(results, args.out)
+    print_results(results)
@@ -0,0 +1,151 @@
+"""
+    Append-only on-disk log of transitions, read back through numpy.memmap so that replay can span
+    far more transitions than fit in memory, and experience outlives the process that collected it.
+    The file is a HEADER_SIZE bytes JSON header followed by fixed-size records (see record_dtype):
+    bit-packed states, the action index, the reward and the game over flag.
+"""
+import json
+import os
+
+import numpy as np
+
+MAGIC = "snake-rl transitions"
+VERSION = 1
+HEADER_SIZE = 256
+
+
+def record_dtype(state_shape):
+    """
+        Structured dtype of one transition whose 0/1 states have 'state_shape'.
+    """
+    packed = (int(np.prod(state_shape)) + 7) // 8
+    return np.dtype([("state", np.uint8, (packed,)), ("action", np.int8), ("reward", "<f4"),
+                     ("next_state", np.uint8, (packed,)), ("game_over", np.bool_)])
+
+
+def _read_header(path):
+    with open(path, "rb") as f:
+        header = json.loads(f.read(HEADER_SIZE).rstrip(b"\0"))
+    if header.get("magic") != MAGIC or header.get("version") != VERSION:
+        raise ValueError(f"{path} is not a transition log")
+    return header
+
+
+class TransitionLogWriter:
+    """
+        Appends transitions to the log 'path' (created if missing). They are buffered in a chunk of
+        'chunk_size' records that is written at once when full, on 'flush' and on 'close'.
+        Only whole records are ever written, so readers never see a partial one.
+    """
+    def __init__(self, path, state_shape, chunk_size=4096):
+        if isinstance(state_shape, int):
+            state_shape = (state_shape,)
+        self.path = path
+        self.state_shape = tuple(state_shape)
+        self.state_values = int(np.prod(self.state_shape))
+        self.dtype = record_dtype(self.state_shape)
+
+        if os.path.exists(path) and os.path.getsize(path) > 0:
+            header = _read_header(path)
+            if tuple(header["state_shape"]) != self.state_shape:
+                raise ValueError(f"{path} holds states of shape {tuple(header['state_shape'])}, "
+                                 f"not {self.state_shape}")
+            self._file = open(path, "r+b")
+            # drop the partial record a crash may have left at the end
+            records = (os.path.getsize(path) - HEADER_SIZE) // self.dtype.itemsize
+            self._file.truncate(HEADER_SIZE + records * self.dtype.itemsize)
+            self._file.seek(0, os.SEEK_END)
+        else:
+            self._file = open(path, "wb")
+            header = json.dumps({"magic": MAGIC, "version": VERSION, "state_shape": list(self.state_shape),
+                                 "record_size": self.dtype.itemsize}).encode()
+            self._file.write(header.ljust(HEADER_SIZE, b"\0"))
+
+        self._chunk = np.zeros(chunk_size, dtype=self.dtype)
+        self._n = 0
+
+    def _pack(self, states):
+        states = np.asarray(states, dtype=np.uint8).reshape(len(states), self.state_values)
+        return np.packbits(states, axis=1)
+
+    def append(self, state, action, reward, next_state, game_over):
+        record = self._chunk[self._n]
+        record["state"] = np.packbits(np.asarray(state, dtype=np.uint8).reshape(-1))
+        record["action"] = action
+        record["reward"] = reward
+        record["next_state"] = np.packbits(np.asarray(next_state, dtype=np.uint8).reshape(-1))
+        record["game_over"] = game_over
+        self._n += 1
+        if self._n == len(self._chunk):
+            self.flush()
+
+    def append_batch(self, states, actions, rewards, next_states, game_overs):
+        states = self._pack(states)
+        next_states = self._pack(next_states)
+        start = 0
+        while start < len(states):
+            n = min(len(self._chunk) - self._n, len(states) - start)
+            chunk = self._chunk[self._n:self._n + n]
+            chunk["state"] = states[start:start + n]
+            chunk["action"] = actions[start:start + n]
+            chunk["reward"] = rewards[start:start + n]
+            chunk["next_state"] = next_states[start:start + n]
+            chunk["game_over"] = game_overs[start:start + n]
+            self._n += n
+            start += n
+            if self._n == len(self._chunk):
+                self.flush()
+
+    def flush(self):
+        if self._n:
+            self._file.write(self._chunk[:self._n].tobytes())
+            self._n = 0
+        self._file.flush()
+
+    def close(self):
+        self.flush()
+        self._file.close()
+
+
+class TransitionLog:
+    """
+        Read-only view of a transition log through numpy.memmap: the records stay on disk and only
+        the sampled ones are read. 'refresh' maps the records appended since it was opened.
+    """
+    def __init__(self, path, seed=None):
+        self.path = path
+        header = _read_header(path)
+        self.state_shape = tuple(header["state_shape"])
+        self.state_values = int(np.prod(self.state_shape))
+        self.dtype = record_dtype(self.state_shape)
+        self.rng = np.random.default_rng(seed)
+        self.records = None
+        self.refresh()
+
+    def refresh(self):
+        n = (os.path.getsize(self.path) - HEADER_SIZE) // self.dtype.itemsize
+        self.records = (np.memmap(self.path, dtype=self.dtype, mode="r", offset=HEADER_SIZE, shape=(n,))
+                        if n else np.zeros(0, dtype=self.dtype))
+
+    def __len__(self):
+        return len(self.records)
+
+    def _unpack(self, states):
+        return np.unpackbits(states, axis=1, count=self.state_values).reshape(len(states), *self.state_shape)
+
+    def sample(self, batch_size):
+        """
+            Sample 'batch_size' transitions uniformly over the whole log, in the format of
+            ReplayBuffer.sample so that QTrainer.train_step consumes them directly.
+        """
+        import torch
+
+        # sorted indices read the file front to back
+        idx = np.sort(self.rng.integers(0, len(self.records), size=batch_size))
+        batch = self.records[idx]
+        # the fields of the records are strided views: tensors need them contiguous
+        return (torch.from_numpy(self._unpack(batch["state"])),
+                torch.from_numpy(np.ascontiguousarray(batch["action"])),
+                torch.from_numpy(np.ascontiguousarray(batch["reward"])),
+                torch.from_numpy(self._unpack(batch["next_state"])),
+                torch.from_numpy(np.ascontiguousarray(batch["game_over"])))
@@ -0,0 +1,319 @@
+import numpy as np
+
+from snake_game_ai import BLOCK_SIZE, CYCLE_REPEATS, CYCLE_WINDOW, DX, DY, TURNS
+from state_encoder import DIRECTION_INDEX, encode_states
+
+# Per-game arrays of VectorSnakeEnv, first axis indexed by game
+GAME_ARRAYS = ("board_cols", "board_rows", "grid", "body", "head_ptr", "length", "head", "direction", "food",
+               "score", "frame_iteration", "window", "window_ptr", "window_len", "visits", "repeated",
+               "cycles_detected")
+
+
+class VectorSnakeEnv:
+    """
+        N independent games of SnakeGameAI stored as NumPy arrays and stepped together.
+        Rewards and termination rules are the ones of SnakeGameAI.play_step,
+        finished games are reset automatically unless 'auto_reset' is False.
+
+        Positions are in cell units (pixels // BLOCK_SIZE) and cells are stored flat (y * cols + x).
+        The arrays are sized for the 'cols' x 'rows' board ('w' x 'h' pixels if not given), and every game
+        plays in its own top-left 'board_cols' x 'board_rows' corner of it (see resize), so that games
+        of different sizes are stepped together.
+        Every game keeps:
+        - grid: occupancy of the board
+        - body: ring buffer of the body cells, body[i, head_ptr[i]] is the head
+        - head, direction (index in RIGHT, DOWN, LEFT, UP), food, score and frame counters
+        - window/visits: the last 'cycle_window' heads and how many times each cell appears there
+        - cycles_detected: how many cycle penalties each game slot received
+        Games are copied with 'take' (e.g. to play branches of a game ahead, see planner.py)
+        and imported from SnakeGameAI instances with 'from_games'.
+    """
+    def __init__(self, n_games, w=640, h=480, seed=None, cycle_window=CYCLE_WINDOW, cycle_repeats=CYCLE_REPEATS,
+                 cols=None, rows=None, auto_reset=True):
+        self.n_games = n_games
+        self.auto_reset = auto_reset
+        self.cycle_window = cycle_window
+        self.cycle_repeats = cycle_repeats
+        self.cols = cols if cols is not None else w // BLOCK_SIZE
+        self.rows = rows if rows is not None else h // BLOCK_SIZE
+        self.n_cells = self.cols * self.rows
+        self.rng = np.random.default_rng(seed)
+        # optional generator of each game (see from_games), used instead of 'rng' to place its food
+        self.rngs = None
+
+        n = n_games
+        # playable board of every game
+        self.board_cols = np.full(n, self.cols, dtype=np.int32)
+        self.board_rows = np.full(n, self.rows, dtype=np.int32)
+        self.grid = np.zeros((n, self.rows, self.cols), dtype=bool)
+        self.body = np.zeros((n, self.n_cells), dtype=np.int32)
+        self.head_ptr = np.zeros(n, dtype=np.int64)
+        self.length = np.zeros(n, dtype=np.int64)
+        self.head = np.zeros((n, 2), dtype=np.int32)
+        self.direction = np.zeros(n, dtype=np.int32)
+        self.food = np.zeros((n, 2), dtype=np.int32)
+        self.score = np.zeros(n, dtype=np.int64)
+        self.frame_iteration = np.zeros(n, dtype=np.int64)
+
+        self.window = np.zeros((n, cycle_window), dtype=np.int32)
+        self.window_ptr = np.zeros(n, dtype=np.int64)
+        self.window_len = np.zeros(n, dtype=np.int64)
+        self.visits = np.zeros((n, self.n_cells), dtype=np.int16)
+        # number of cells in the window visited at least 'cycle_repeats' times
+        self.repeated = np.zeros(n, dtype=np.int64)
+        self.cycles_detected = np.zeros(n, dtype=np.int64)
+
+        self._all = np.arange(n)
+        self.reset()
+
+    def reset(self, indices=None):
+        """
+            Init or reset the games in 'indices' (all of them if None).
+        """
+        idx = self._all if indices is None else np.asarray(indices, dtype=np.int64)
+        if len(idx) == 0:
+            return
+
+        self.grid[idx] = False
+        self.visits[idx] = 0
+        self.window_ptr[idx] = 0
+        self.window_len[idx] = 0
+        self.repeated[idx] = 0
+
+        # same starting snake as SnakeGameAI.reset: 3 cells long, moving right from the center
+        x = self.board_cols[idx] // 2
+        y = self.board_rows[idx] // 2
+        self.direction[idx] = 0
+        self.head[idx, 0] = x
+        self.head[idx, 1] = y
+        flat = self.grid.reshape(self.n_games, -1)
+        for k in range(3):
+            # the tail lives at ring index 0 and the head at ring index 2
+            self.body[idx, 2 - k] = y * self.cols + x - k
+            flat[idx, y * self.cols + x - k] = True
+        self.head_ptr[idx] = 2
+        self.length[idx] = 3
+
+        self.score[idx] = 0
+        self.frame_iteration[idx] = 0
+        self._place_food(idx)
+
+    def resize(self, indices, cols, rows):
+        """
+            Set the board of the games in 'indices' to 'cols' x 'rows' cells (one size for all of them
+            or one per game) and reset them. Boards cannot be larger than the one of the env.
+        """
+        idx = np.asarray(indices, dtype=np.int64)
+        cols = np.broadcast_to(np.asarray(cols, dtype=np.int32), idx.shape)
+        rows = np.broadcast_to(np.asarray(rows, dtype=np.int32), idx.shape)
+        if (cols > self.cols).any() or (rows > self.rows).any():
+            raise ValueError(f"boards are limited to {self.cols}x{self.rows} cells")
+        if (cols < 4).any() or (rows < 1).any():
+            raise ValueError("boards need at least 4 columns for the starting snake")
+        self.board_cols[idx] = cols
+        self.board_rows[idx] = rows
+        self.reset(idx)
+
+    @classmethod
+    def from_games(cls, games, seed=None, auto_reset=True, rngs=None):
+        """
+            An env holding the current state of every SnakeGameAI of 'games', on boards of their sizes.
+            The env places the next food with its own generator, not with the ones of the games,
+            or with 'rngs' (one generator per game) if given: the food of a game then does not depend
+            on the other games of the env.
+        """
+        first = games[0]
+        env = cls(len(games), seed=seed, cycle_window=first.cycle_window, cycle_repeats=first.cycle_repeats,
+                  cols=max(game.cols for game in games), rows=max(game.rows for game in games),
+                  auto_reset=auto_reset)
+        env.board_cols[:] = [game.cols for game in games]
+        env.board_rows[:] = [game.rows for game in games]
+        env.grid[:] = False
+        env.body[:] = 0
+        env.visits[:] = 0
+        for i, game in enumerate(games):
+            # ring buffers from index 0: the tail first, the head last
+            cells = [(int(pt.y) // BLOCK_SIZE) * env.cols + int(pt.x) // BLOCK_SIZE for pt in reversed(game.snake)]
+            env.body[i, :len(cells)] = cells
+            env.grid.reshape(env.n_games, -1)[i, cells] = True
+            env.head_ptr[i] = len(cells) - 1
+            env.length[i] = len(cells)
+            env.head[i] = (int(game.head.x) // BLOCK_SIZE, int(game.head.y) // BLOCK_SIZE)
+            env.direction[i] = DIRECTION_INDEX[game.direction]
+            env.food[i] = (int(game.food.x) // BLOCK_SIZE, int(game.food.y) // BLOCK_SIZE)
+            env.score[i] = game.score
+            env.frame_iteration[i] = game.frame_iteration
+
+            heads = [(int(pt.y) // BLOCK_SIZE) * env.cols + int(pt.x) // BLOCK_SIZE for pt in game.cycle]
+            env.window[i, :len(heads)] = heads
+            env.window_len[i] = len(heads)
+            env.window_ptr[i] = len(heads) % env.cycle_window
+            np.add.at(env.visits[i], heads, 1)
+            env.repeated[i] = game._repeated
+            env.cycles_detected[i] = game.cycles_detected
+        if rngs is not None:
+            env.rngs = list(rngs)
+        return env
+
+    def take(self, indices):
+        """
+            A new env with copies of the games in 'indices' (repeated indices copy a game several times),
+            sharing the random generators of this env: the copies of a game share its generator in 'rngs'.
+        """
+        idx = np.asarray(indices, dtype=np.int64)
+        env = object.__new__(type(self))
+        env.__dict__.update(self.__dict__)
+        for name in GAME_ARRAYS:
+            # fancy indexing copies
+            setattr(env, name, getattr(self, name)[idx])
+        if self.rngs is not None:
+            env.rngs = [self.rngs[i] for i in idx]
+        env.n_games = len(idx)
+        env._all = np.arange(len(idx))
+        return env
+
+    def _place_food(self, idx):
+        """
+            Place the food on a random free cell of the board of every game in 'idx'.
+        """
+        if self.rngs is not None:
+            for i in idx:
+                self._place_food_with(i, self.rngs[i])
+            return
+        flat = self.grid.reshape(self.n_games, -1)
+        pending = idx
+        # rejection sampling is fast while the board is mostly empty
+        for _ in range(8):
+            x = (self.rng.random(len(pending)) * self.board_cols[pending]).astype(np.int32)
+            y = (self.rng.random(len(pending)) * self.board_rows[pending]).astype(np.int32)
+            free = ~flat[pending, y * self.cols + x]
+            self.food[pending[free], 0] = x[free]
+            self.food[pending[free], 1] = y[free]
+            pending = pending[~free]
+            if len(pending) == 0:
+                return
+        # crowded boards: sample directly among the free cells
+        for i in pending:
+            self._place_food_among_free(i, self.rng)
+
+    def _place_food_with(self, i, rng):
+        """
+            Place the food of game 'i' drawing only from 'rng', with the same rule as _place_food.
+        """
+        cols = int(self.board_cols[i])
+        rows = int(self.board_rows[i])
+        for _ in range(8):
+            x = int(rng.random() * cols)
+            y = int(rng.random() * rows)
+            if not self.grid[i, y, x]:
+                self.food[i] = (x, y)
+                return
+        self._place_food_among_free(i, rng)
+
+    def _place_food_among_free(self, i, rng):
+        cols = self.board_cols[i]
+        free_cells = np.flatnonzero(~self.grid[i, :self.board_rows[i], :cols])
+        if len(free_cells) == 0:
+            # the snake fills the board, the food is unreachable
+            self.food[i] = (-1, -1)
+            return
+        cell = free_cells[rng.integers(len(free_cells))]
+        self.food[i] = (cell % cols, cell // cols)
+
+    def _push_window(self, idx, cells):
+        """
+            Append the new heads to the cycle window and keep the visit counts up to date.
+        """
+        full = self.window_len[idx] == self.cycle_window
+        # forget the oldest head of full windows
+        old_idx = idx[full]
+        old_cells = self.window[old_idx, self.window_ptr[old_idx]]
+        was_repeated = self.visits[old_idx, old_cells] == self.cycle_repeats
+        self.repeated[old_idx[was_repeated]] -= 1
+        self.visits[old_idx, old_cells] -= 1
+
+        self.window[idx, self.window_ptr[idx]] = cells
+        self.window_ptr[idx] = (self.window_ptr[idx] + 1) % self.cycle_window
+        self.window_len[idx] = np.minimum(self.window_len[idx] + 1, self.cycle_window)
+        self.visits[idx, cells] += 1
+        now_repeated = self.visits[idx, cells] == self.cycle_repeats
+        self.repeated[idx[now_repeated]] += 1
+
+    def _clear_window(self, idx):
+        for i in idx:
+            self.visits[i, self.window[i, :self.window_len[i]]] = 0
+        self.window_ptr[idx] = 0
+        self.window_len[idx] = 0
+        self.repeated[idx] = 0
+
+    def observe(self, out=None):
+        """
+            The 11 state features of every game, as computed by Agent.get_state, written into 'out'.
+        """
+        return encode_states(self.grid, self.head, self.direction, self.food, out,
+                             cols=self.board_cols, rows=self.board_rows)
+
+    def step(self, actions):
+        """
+            Advance every game by one move.
+            'actions' holds one action per game, either an index (0 = straight, 1 = right turn, 2 = left turn)
+            or a one-hot row [straight, right, left] as used by SnakeGameAI.play_step.
+            Returns rewards, game_overs and scores. Scores of finished games are the final ones,
+            these games are already reset when step returns. Without 'auto_reset' they keep their
+            last state instead and must not be stepped again (drop them with 'take').
+        """
+        actions = np.asarray(actions)
+        if actions.ndim == 2:
+            actions = np.argmax(actions, axis=1)
+
+        # 0. update the time step
+        self.frame_iteration += 1
+        old_head = self.head.copy()
+        initial_distance = ((old_head - self.food) ** 2).sum(axis=1)
+
+        # 2. move: update the head of the snakes
+        self.direction = (self.direction + TURNS[actions]) % 4
+        self.head[:, 0] += DX[self.direction]
+        self.head[:, 1] += DY[self.direction]
+        x = self.head[:, 0]
+        y = self.head[:, 1]
+        final_distance = ((self.head - self.food) ** 2).sum(axis=1)
+
+        # 3. check if game over: walls, body (the tail has not moved yet) or too long without eating
+        out = (x < 0) | (x >= self.board_cols) | (y < 0) | (y >= self.board_rows)
+        cells = np.clip(y, 0, self.rows - 1) * self.cols + np.clip(x, 0, self.cols - 1)
+        flat = self.grid.reshape(self.n_games, -1)
+        hit = out | flat[self._all, cells]
+        game_over = hit | (self.frame_iteration > 100 * (self.length + 1))
+
+        rewards = np.where(final_distance < initial_distance, 0.1, -0.1)
+        alive = self._all[~game_over]
+        ate = alive[(x[alive] == self.food[alive, 0]) & (y[alive] == self.food[alive, 1])]
+        moved = alive[(x[alive] != self.food[alive, 0]) | (y[alive] != self.food[alive, 1])]
+
+        # 4. insert the new heads, then place new food or just move
+        self.head_ptr[alive] = (self.head_ptr[alive] + 1) % self.n_cells
+        self.body[alive, self.head_ptr[alive]] = cells[alive]
+        flat[alive, cells[alive]] = True
+        self.length[alive] += 1
+
+        self.score[ate] += 1
+        rewards[ate] = 10
+        self._place_food(ate)
+
+        tail_ptr = (self.head_ptr[moved] - self.length[moved] + 1) % self.n_cells
+        flat[moved, self.body[moved, tail_ptr]] = False
+        self.length[moved] -= 1
+
+        self._push_window(alive, cells[alive])
+        cycling = moved[self.repeated[moved] > 0]
+        rewards[cycling] = -1
+        self.cycles_detected[cycling] += 1
+        self._clear_window(cycling)
+
+        rewards[game_over] = -10
+        scores = self.score.copy()
+        if self.auto_reset:
+            self.reset(self._all[game_over])
+
+        return rewards, game_over, scores